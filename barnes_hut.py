@@ -0,0 +1,179 @@
+import numpy as np
+
+LEVELS = 16 # quadtree depth, 2**16 cells per side
+CHUNK = 2048 # targets walked through the tree at once
+GROUP = 16 # morton neighbours that share one walk
+
+
+def _spread(v):
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def _morton(pos, lo, size):
+    cells = ((pos - lo) / size * (1 << LEVELS)).astype(np.int64)
+    np.clip(cells, 0, (1 << LEVELS) - 1, out=cells)
+    return _spread(cells[:, 0]) | (_spread(cells[:, 1]) << 1)
+
+
+class Quadtree:
+    # nodes of every level are stored flat, each level sorted by morton key so the
+    # children of a node are always one contiguous run
+    def __init__(self, pos, mass, lo, size):
+        keys = _morton(pos, lo, size)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        mass = mass[order]
+        pos = pos[order]
+        weighted = pos * mass[:, None]
+        self.body_pos = pos
+        self.body_mass = mass
+
+        node_key, node_level, node_mass, node_com, node_count, node_first = [], [], [], [], [], []
+        child_start, child_count = [], []
+        alive = np.arange(len(keys))
+        base = 0
+        prev_keys = None
+        for level in range(LEVELS + 1):
+            prefix = keys[alive] >> (2 * (LEVELS - level))
+            starts = np.flatnonzero(np.r_[True, prefix[1:] != prefix[:-1]])
+            counts = np.diff(np.r_[starts, len(prefix)])
+            m = np.add.reduceat(mass[alive], starts)
+            com = np.add.reduceat(weighted[alive], starts) / m[:, None]
+            single = counts == 1
+            com[single] = pos[alive[starts[single]]] # exact, so a body sees itself at distance 0
+
+            if prev_keys is not None:
+                parent = np.searchsorted(prev_keys, prefix[starts] >> 2)
+                first = np.flatnonzero(np.r_[True, parent[1:] != parent[:-1]])
+                child_start[-1][parent[first]] = base + len(prev_keys) + first
+                child_count[-1][parent[first]] = np.diff(np.r_[first, len(parent)])
+                base += len(prev_keys)
+
+            node_key.append(prefix[starts])
+            node_level.append(np.full(len(starts), level))
+            node_mass.append(m)
+            node_com.append(com)
+            node_count.append(counts)
+            node_first.append(alive[starts])
+            child_start.append(np.zeros(len(starts), np.int64))
+            child_count.append(np.zeros(len(starts), np.int64))
+            prev_keys = prefix[starts]
+
+            # nodes that hold a single body are leaves, only the others get children
+            split = counts > 1
+            if level == LEVELS or not split.any():
+                break
+            alive = alive[np.repeat(split, counts)]
+
+        self.key = np.concatenate(node_key)
+        self.level = np.concatenate(node_level)
+        self.mass = np.concatenate(node_mass)
+        self.com = np.concatenate(node_com)
+        self.count = np.concatenate(node_count)
+        self.first = np.concatenate(node_first)
+        self.child_start = np.concatenate(child_start)
+        self.child_count = np.concatenate(child_count)
+        self.size2 = (size / (1 << self.level)) ** 2
+
+
+def _expand(count):
+    # position of every element inside its own run, for runs of the given lengths
+    return np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count, count)
+
+
+def _pull(gx, gy, gi, sx, sy, sm, tiny, eps2=0.0):
+    # every target of group gi[k] against source k, summed per group
+    if not len(gi):
+        # every accepted node was a bucket and already pulled body by body
+        nothing = np.zeros((0,) + gx.shape[1:])
+        return gi, nothing, nothing
+    order = np.argsort(gi, kind="stable")
+    gi = gi[order]
+    dx = sx[order, None] - gx[gi]
+    dy = sy[order, None] - gy[gi]
+    r2 = dx * dx
+    r2 += dy * dy
+    itself = r2 <= tiny # the body itself, it sits exactly on its own leaf
+    if eps2:
+        r2 += eps2
+    w = np.sqrt(r2)
+    w *= r2
+    with np.errstate(divide="ignore"):
+        np.divide(sm[order, None], w, out=w)
+    w[itself] = 0
+    dx *= w
+    dy *= w
+    first = np.flatnonzero(np.r_[True, gi[1:] != gi[:-1]])
+    return gi[first], np.add.reduceat(dx, first), np.add.reduceat(dy, first)
+
+
+def accelerations(pos, mass, theta=0.5, softening=0.0):
+    # returns sum(m * d / (r**2 + softening**2)**1.5) over the tree, the caller multiplies by G
+    acc = np.zeros_like(pos)
+    src = np.flatnonzero(mass)
+    if len(src) == 0:
+        return acc
+    lo = pos.min(0)
+    size = float((pos.max(0) - lo).max()) * (1 + 1e-9) or 1.0
+    tree = Quadtree(pos[src], mass[src], lo, size)
+    theta2 = theta * theta
+    tiny = (size * 1e-12) ** 2 # separations below this are rounding noise of coincident bodies
+
+    # targets are walked through the tree in groups of morton neighbours, a node is
+    # approximated only when it is far enough from the whole bounding box of the group
+    n = len(pos)
+    groups = -(-n // GROUP)
+    order = np.argsort(_morton(pos, lo, size), kind="stable")
+    order = np.r_[order, np.repeat(order[-1:], groups * GROUP - n)] # pad the last group
+    gx = pos[order, 0].reshape(groups, GROUP)
+    gy = pos[order, 1].reshape(groups, GROUP)
+    g_lo = np.c_[gx.min(1), gy.min(1)]
+    g_hi = np.c_[gx.max(1), gy.max(1)]
+    # a leaf at full depth can hold several bodies, those are summed body by body
+    bucket = (tree.level == LEVELS) & (tree.count > 1)
+
+    ax = np.zeros((groups, GROUP))
+    ay = np.zeros((groups, GROUP))
+    step = max(1, CHUNK // GROUP)
+    for first in range(0, groups, step):
+        gi = np.arange(first, min(first + step, groups))
+        ni = np.zeros(len(gi), np.int64)
+        near_g, near_n = [], []
+        while len(gi):
+            com = tree.com[ni]
+            d = np.maximum(np.maximum(g_lo[gi] - com, com - g_hi[gi]), 0)
+            r2 = np.einsum("ij,ij->i", d, d)
+            leaf = tree.child_count[ni] == 0
+            take = leaf | (tree.size2[ni] < theta2 * r2)
+            near_g.append(gi[take])
+            near_n.append(ni[take])
+
+            o_gi = gi[~take]
+            o_ni = ni[~take]
+            count = tree.child_count[o_ni]
+            gi = np.repeat(o_gi, count)
+            ni = np.repeat(tree.child_start[o_ni], count) + _expand(count)
+
+        near_g = np.concatenate(near_g)
+        near_n = np.concatenate(near_n)
+        split = bucket[near_n]
+        if split.any():
+            count = tree.count[near_n[split]]
+            body = np.repeat(tree.first[near_n[split]], count) + _expand(count)
+            sg, sx, sy = _pull(gx, gy, np.repeat(near_g[split], count),
+                               tree.body_pos[body, 0], tree.body_pos[body, 1], tree.body_mass[body], tiny, softening ** 2)
+            ax[sg] += sx
+            ay[sg] += sy
+            near_g = near_g[~split]
+            near_n = near_n[~split]
+        sg, sx, sy = _pull(gx, gy, near_g, tree.com[near_n, 0], tree.com[near_n, 1], tree.mass[near_n], tiny, softening ** 2)
+        ax[sg] += sx
+        ay[sg] += sy
+
+    acc[order[:n], 0] = ax.ravel()[:n]
+    acc[order[:n], 1] = ay.ravel()[:n]
+    return acc
@@ -0,0 +1,138 @@
+import json, os, platform, sys, time, tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from physics import BodySystem
+from scenario import asteroid_belt, load_scenario, planetary_reset
+
+SCENES = (10, 100, 1000, 10000, 100000)
+DAY = 86400
+
+
+def scene(bodies, solver="direct", integrator="leapfrog", massive=False):
+    # the planets plus an asteroid belt filling up the rest, with `massive` the belt pulls too
+    system = BodySystem(solver=solver, integrator=integrator)
+    planetary_reset(system)
+    extra = max(0, bodies - system.n)
+    if extra:
+        first = asteroid_belt(system, extra)
+        if massive:
+            system.mass[first:system.n] = 1e18
+            system.touch()
+    return system
+
+
+def timed(call, seconds, least=3):
+    # calls until `seconds` have passed, returns every call's time
+    times = []
+    end = time.perf_counter() + seconds
+    while len(times) < least or time.perf_counter() < end:
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def percentiles(times):
+    return {"p50_ms": float(np.percentile(times, 50) * 1e3), "p99_ms": float(np.percentile(times, 99) * 1e3),
+            "mean_ms": float(times.mean() * 1e3), "count": len(times)}
+
+
+def allocations(call, repeat=5):
+    # tracemalloc sees numpy's buffers too, reports the average blocks and bytes left behind
+    # and the peak of temporaries per call
+    call()
+    tracemalloc.start()
+    try:
+        peak = 0
+        before = tracemalloc.take_snapshot()
+        for _ in range(repeat):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    return {"blocks": sum(max(0, d.count_diff) for d in diff) / repeat,
+            "bytes": sum(max(0, d.size_diff) for d in diff) / repeat, "peak_bytes": peak}
+
+
+def peak_rss():
+    # ru_maxrss is kilobytes on linux and bytes on macos, windows has no resource module
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def physics(bodies, seconds, dt=DAY, **options):
+    system = scene(bodies, **options)
+    system.step(dt)
+    steps = timed(lambda: system.step(dt), seconds)
+    forces = timed(system.accelerations, seconds / 2)
+    return {"bodies": system.n, "sources": len(system.sources()), **options,
+            "steps_per_s": float(len(steps) / steps.sum()), "step": percentiles(steps),
+            "accelerations": percentiles(forces), "allocations_per_step": allocations(lambda: system.step(dt)),
+            "peak_rss_bytes": peak_rss()}
+
+
+def frames(bodies, seconds, threaded=False):
+    # the real App on the dummy video driver, uncapped. stepping in the frame it is fed a
+    # steady 60 fps frame time so every frame does the same simulation work, threaded the
+    # physics runs at the default warp next to it as it does in the window
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import solar_system
+    app = solar_system.App(asteroids=max(0, bodies - len(load_scenario().names)), threaded=threaded)
+    app.fps = 0
+    def frame():
+        app.frame_time = 1 / 60
+        app.frame()
+    for _ in range(10):
+        frame()
+    start = app.system.time
+    times = timed(frame, seconds)
+    steps = (app.system.time - start) / solar_system.Planet.TIMESTEP
+    result = {"bodies": app.system.n, "threaded": threaded, "frame": percentiles(times),
+              "fps": float(len(times) / times.sum()), "steps_per_s": float(steps / times.sum()),
+              "allocations_per_frame": allocations(frame), "peak_rss_bytes": peak_rss()}
+    if app.physics is not None:
+        app.physics.stop()
+    return result
+
+
+def _isolated(call, *args, **kwargs):
+    # every scene gets a fresh process so peak rss and caches do not leak between them
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(call, *args, **kwargs).result()
+
+
+def run(scenes=SCENES, seconds=1.0, solver="direct", integrator="leapfrog", massive=False, window=True, report=None):
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # inherited by the scene processes
+    import pygame
+    results = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(),
+                        "numpy": np.__version__, "pygame": pygame.version.ver, "platform": platform.platform(),
+                        "machine": platform.machine(), "cpus": os.cpu_count(), "seconds": seconds},
+               "physics": [], "frames": []}
+    for bodies in scenes:
+        results["physics"].append(_isolated(physics, bodies, seconds, solver=solver, integrator=integrator, massive=massive))
+        if report:
+            report("physics", results["physics"][-1])
+        if window:
+            for threaded in (False, True):
+                results["frames"].append(_isolated(frames, bodies, seconds, threaded))
+                if report:
+                    report("frames", results["frames"][-1])
+    return results
+
+
+def write(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
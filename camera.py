@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class Camera:
+    # maps world metres to the pixels of one viewport: `center` is the screen point the focus
+    # lands on, `scale` pixels per metre. the focus is the followed body (or the origin) plus
+    # a pan offset in metres, so a followed body stays put however far it travels
+    def __init__(self, center, scale, follow=None):
+        self.center = center
+        self.home = (scale, follow)
+        self.scale = scale
+        self.follow = follow
+        self.offset = np.zeros(2)
+
+    def reset(self):
+        self.scale, self.follow = self.home
+        self.offset = np.zeros(2)
+
+    @property
+    def at_home(self):
+        return (self.scale, self.follow) == self.home and not self.offset.any()
+
+    def focus(self, view):
+        if self.follow is None or self.follow >= len(view):
+            return self.offset
+        return view[self.follow] + self.offset
+
+    def pan(self, dx, dy):
+        # by a screen distance in pixels
+        self.offset = self.offset - np.array([dx, dy]) / self.scale
+
+    def zoom(self, factor, anchor=None):
+        # keeps the world point under the screen point `anchor` where it is
+        if anchor is not None:
+            shift = (np.array(anchor) - self.center) / self.scale
+            self.offset = self.offset + shift - shift / factor
+        self.scale *= factor
+
+    def set_follow(self, index):
+        # switching the followed body keeps the zoom, the pan starts over
+        self.follow = index
+        self.offset = np.zeros(2)
+
+    def shift(self, view):
+        # screen = world * scale + shift
+        return np.asarray(self.center, float) - self.focus(view) * self.scale
+
+    def to_world(self, pos, view):
+        return (np.array(pos) - self.center) / self.scale + self.focus(view)
+
+
+class Projector:
+    # world to screen for every camera in one broadcast pass, x and y come back as
+    # (cameras, bodies) arrays. the result is kept and handed out again while neither the
+    # view nor any camera changed
+    def __init__(self):
+        self.key = None
+        self.x = self.y = None
+
+    def __call__(self, view, cameras, version):
+        scale = np.array([camera.scale for camera in cameras])
+        focus = np.array([camera.focus(view) for camera in cameras])
+        center = np.array([camera.center for camera in cameras], float)
+        key = (version, len(view), scale.tobytes(), focus.tobytes(), center.tobytes())
+        if key != self.key:
+            shift = center - focus * scale[:, None]
+            self.x = np.multiply.outer(scale, view[:, 0])
+            self.x += shift[:, 0, None]
+            self.y = np.multiply.outer(scale, view[:, 1])
+            self.y += shift[:, 1, None]
+            self.key = key
+        return self.x, self.y
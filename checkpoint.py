@@ -0,0 +1,172 @@
+import json, os, struct, threading, time
+
+import numpy as np
+
+from integrators import INTEGRATORS
+
+MAGIC = b"SOLCKPT\0"
+VERSION = 1
+ALIGN = 64 # every array starts on a cache line so the memory map hands it out as it is
+_PREFIX = struct.Struct("<8sII") # magic, version, header bytes
+_STATE = "integrator." # array names of the integrator state
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def capture(system, names=()):
+    # the whole simulation state as (header, arrays), the arrays are copies so the system can
+    # keep stepping while they are written
+    integrator = system.integrator
+    kind = next((name for name, cls in INTEGRATORS.items() if type(integrator) is cls), None)
+    if kind is None:
+        raise TypeError(f"cannot checkpoint a {type(integrator).__name__}, it is not in INTEGRATORS")
+    header = {
+        "bodies": system.n,
+        "time": float(system.time),
+        "sun": int(system.sun),
+        "names": list(names),
+        "solver": system.solver,
+        "theta": system.theta,
+        "softening": system.softening,
+        "integrator": kind,
+        "state": {},
+    }
+    arrays = {
+        "pos": system.positions.copy(),
+        "vel": system.velocities.copy(),
+        "mass": system.masses.copy(),
+    }
+    for key, value in integrator.state().items():
+        if isinstance(value, np.ndarray):
+            arrays[_STATE + key] = value
+        else:
+            header["state"][key] = value
+    collisions = system.collisions
+    if collisions is not None and len(collisions.alive) == system.n:
+        arrays["alive"] = collisions.alive.copy()
+    return header, arrays
+
+
+def write(path, header, arrays):
+    # prefix, json header, then the raw arrays each at the next multiple of ALIGN. written next
+    # to the target and renamed over it, a crash halfway leaves the previous checkpoint alone
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        table[name] = [offset, array.dtype.str, list(array.shape)]
+        offset = _aligned(offset + array.nbytes)
+    blob = json.dumps({**header, "version": VERSION, "arrays": table}).encode()
+    start = _aligned(_PREFIX.size + len(blob))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(blob)))
+        f.write(blob)
+        for name, array in arrays.items():
+            f.seek(start + table[name][0])
+            array.tofile(f)
+        f.truncate(start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save(path, system, names=()):
+    write(path, *capture(system, names))
+
+
+def read(path):
+    # (header, arrays) with the arrays read only views of a memory map, nothing is read from
+    # disk until it is touched, so opening a million body checkpoint costs the same as ten
+    with open(path, "rb") as f:
+        magic, version, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint")
+        if version != VERSION:
+            raise ValueError(f"{path} is checkpoint version {version}, expected {VERSION}")
+        header = json.loads(f.read(size))
+    start = _aligned(_PREFIX.size + size)
+    data = np.memmap(path, np.uint8, "r")
+    arrays = {}
+    for name, (offset, dtype, shape) in header.pop("arrays").items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = data[start + offset:start + offset + count].view(dtype).reshape(shape)
+    return header, arrays
+
+
+def restore(system, path, bodies=None):
+    # puts the system back where the checkpoint left it, returns the body names. with `bodies`
+    # a checkpoint of a different scene is refused before anything is touched
+    header, arrays = read(path)
+    if bodies is not None and header["bodies"] != bodies:
+        raise ValueError(f"{path} holds {header['bodies']} bodies, the scene has {bodies}")
+    system.solver = header["solver"]
+    system.theta = header["theta"]
+    system.softening = header["softening"]
+    system.integrator = header["integrator"]
+    system.load(arrays["pos"], arrays["vel"], arrays["mass"])
+    system.time = header["time"]
+    system.sun = header["sun"]
+    if system.collisions is not None and "alive" in arrays:
+        system.collisions.alive = np.array(arrays["alive"])
+    # after load, which reset the integrator
+    state = dict(header["state"])
+    for name, array in arrays.items():
+        if name.startswith(_STATE):
+            state[name[len(_STATE):]] = array
+    system.integrator.load_state(state)
+    return header["names"]
+
+
+class Checkpointer:
+    # writes checkpoints on a background thread, `save` only copies the arrays and returns. a
+    # save that comes in while one is being written waits its turn, a newer one replaces it
+    def __init__(self):
+        self.ready = threading.Condition()
+        self.pending = None
+        self.busy = False
+        self.closed = False
+        self.written = None # (path, simulated time, wall time) of the last finished checkpoint
+        self.error = None
+        self.thread = threading.Thread(target=self._work, name="checkpoint", daemon=True)
+        self.thread.start()
+
+    def save(self, path, system, names=()):
+        job = (path, *capture(system, names))
+        with self.ready:
+            self.pending = job
+            self.ready.notify_all()
+
+    def _work(self):
+        while True:
+            with self.ready:
+                while self.pending is None and not self.closed:
+                    self.ready.wait()
+                if self.pending is None:
+                    return
+                (path, header, arrays), self.pending = self.pending, None
+                self.busy = True
+            try:
+                write(path, header, arrays)
+                self.written = (path, header["time"], time.time())
+            except OSError as error:
+                self.error = error
+            with self.ready:
+                self.busy = False
+                self.ready.notify_all()
+
+    def wait(self):
+        with self.ready:
+            while self.pending is not None or self.busy:
+                self.ready.wait()
+
+    def close(self):
+        # the pending checkpoint is still written
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+        self.thread.join()
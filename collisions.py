@@ -0,0 +1,210 @@
+from collections import deque, namedtuple
+
+import numpy as np
+
+from barnes_hut import _expand
+
+RESPONSES = ("merge", "bounce", "none")
+# kind is "encounter" when two bodies come within the encounter distance, "merge", "bounce" or
+# with the "none" response "collision" when they touch. i survives a merge, j is gone
+Event = namedtuple("Event", "time kind i j distance")
+
+_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+_SPAN = 1 << 30 # cell coordinates are clipped to this, far beyond any sane scene
+
+
+class Collisions:
+    # close encounters and collisions, checked after every step. bodies are spheres of
+    # `density` kg/m³, so massless test particles are points that can hit a planet but never
+    # each other. the broad phase hashes the bodies with mass into a uniform grid of cells at
+    # least as big as the largest interaction distance and looks every body up in the 9 cells
+    # around it: O(N log N) for the sort, O(N) for everything else
+    BIG = 32
+    DENSE = 1 << 14 # below this many pairs the grid is not worth it
+
+    def __init__(self, response="merge", density=1000.0, encounter=0.0, restitution=1.0, keep=10000):
+        if response not in RESPONSES:
+            raise ValueError(f"unknown response {response!r}, pick one of {RESPONSES}")
+        self.response = response
+        self.density = density
+        self.encounter = encounter # m, 0 reports only collisions
+        self.restitution = restitution # 1 elastic, 0 the bodies stick together along the normal
+        self.alive = np.ones(0, bool)
+        self.events = deque(maxlen=keep) # the latest events for whoever polls, hooks see them all
+        self.hooks = []
+        self.close = set()
+
+    def radius(self, mass):
+        return np.cbrt(mass * (3 / (4 * np.pi * self.density)))
+
+    def drain(self):
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def _emit(self, event):
+        self.events.append(event)
+        for hook in self.hooks:
+            hook(event)
+
+    def reset(self):
+        # after a scene was loaded again, every body is back
+        self.alive = np.ones(0, bool)
+        self.close.clear()
+
+    def pairs(self, pos, mass, alive, radius):
+        # candidate pairs (i, j) closer than their radii or the encounter distance could
+        # reach, j always has mass, each pair once. the BIG largest bodies are tested against
+        # everything directly so the grid cells can stay as small as the rest of the bodies
+        src = np.flatnonzero(alive & (mass > 0))
+        query = np.flatnonzero(alive)
+        if len(src) * len(query) <= self.DENSE:
+            d = pos[query, None] - pos[src]
+            close = np.hypot(d[..., 0], d[..., 1]) < np.maximum(radius[query, None] + radius[src], self.encounter)
+            i, j = np.nonzero(close)
+            i = query[i]
+            j = src[j]
+            keep = (i != j) & ((mass[i] == 0) | (i < j))
+            return i[keep], j[keep]
+        found_i, found_j = [], []
+        big = src
+        if len(src) > self.BIG:
+            small_radius = np.partition(radius[src], -self.BIG - 1)[-self.BIG - 1]
+            big = src[radius[src] > small_radius]
+            is_big = np.zeros(len(mass), bool)
+            is_big[big] = True
+            cell = max(self.encounter, 2 * float(small_radius))
+            if cell > 0:
+                self._grid(pos, mass, src[~is_big[src]], query[~is_big[query]], cell, found_i, found_j)
+        qx = pos[query, 0]
+        qy = pos[query, 1]
+        widest = float(radius[query].max(initial=0))
+        for b in big.tolist():
+            # everything within the widest possible reach first, then the exact test on those few
+            reach = max(widest + radius[b], self.encounter)
+            dx = qx - pos[b, 0]
+            dy = qy - pos[b, 1]
+            dx *= dx
+            dy *= dy
+            dx += dy
+            near = query[dx < reach * reach]
+            d = pos[near] - pos[b]
+            near = near[np.hypot(d[:, 0], d[:, 1]) < np.maximum(radius[near] + radius[b], self.encounter)]
+            # two big bodies find each other twice
+            near = near[(near != b) & ((mass[near] == 0) | ~np.isin(near, big) | (near < b))]
+            found_i.append(near)
+            found_j.append(np.full(len(near), b))
+        if not found_i:
+            return np.zeros(0, np.intp), np.zeros(0, np.intp)
+        i = np.concatenate(found_i)
+        j = np.concatenate(found_j)
+        return i, j
+
+    def _grid(self, pos, mass, src, query, cell, found_i, found_j):
+        lo = pos[src].min(0)
+        cells = np.clip(np.floor((pos - lo) / cell), -_SPAN, _SPAN).astype(np.int64) + _SPAN
+        keys = (cells[src, 0] << 32) | cells[src, 1]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        src = src[order]
+        # one entry per occupied cell: its key, where its bodies start and how many there are
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        keys = keys[starts]
+        counts = np.diff(np.r_[starts, len(src)])
+        # queries sorted by cell and looked up once per occupied cell, adding an offset keeps
+        # the keys sorted so every search walks the table in order
+        q_keys = (cells[query, 0] << 32) | cells[query, 1]
+        order = np.argsort(q_keys, kind="stable")
+        query = query[order]
+        q_keys = q_keys[order]
+        new = np.r_[True, q_keys[1:] != q_keys[:-1]]
+        unique = q_keys[new]
+        q_cell = np.cumsum(new) - 1
+        for dx, dy in _OFFSETS:
+            key = unique + ((dx << 32) + dy)
+            at = np.minimum(np.searchsorted(keys, key), len(keys) - 1)
+            found = keys[at] == key
+            first = starts[at]
+            count = np.where(found, counts[at], 0)[q_cell]
+            hit = np.flatnonzero(count)
+            if len(hit):
+                count = count[hit]
+                i = np.repeat(query[hit], count)
+                j = src[np.repeat(first[q_cell[hit]], count) + _expand(count)]
+                # two bodies with mass find each other twice
+                keep = (i != j) & ((mass[i] == 0) | (i < j))
+                found_i.append(i[keep])
+                found_j.append(j[keep])
+
+    def check(self, system):
+        n = system.n
+        if len(self.alive) < n:
+            self.alive = np.r_[self.alive, np.ones(n - len(self.alive), bool)]
+        alive = self.alive[:n]
+        pos = system.positions
+        mass = system.masses
+        radius = self.radius(mass)
+        i, j = self.pairs(pos, mass, alive, radius)
+        d = pos[j] - pos[i]
+        dist = np.hypot(d[:, 0], d[:, 1])
+        hit = dist < radius[i] + radius[j]
+        near = ~hit & (dist < self.encounter)
+
+        # an encounter is reported once when it starts, not every step it lasts
+        close = set(zip(i[near].tolist(), j[near].tolist()))
+        for a, b in close - self.close:
+            self._emit(Event(system.time, "encounter", a, b, float(np.hypot(*(pos[b] - pos[a])))))
+        self.close = close
+
+        if self.response == "none":
+            for a, b, r in zip(i[hit].tolist(), j[hit].tolist(), dist[hit].tolist()):
+                self._emit(Event(system.time, "collision", a, b, r))
+            return
+        if not hit.any():
+            return
+        # collisions are rare, they are resolved one by one so a body can take part in several
+        for a, b, r in zip(i[hit].tolist(), j[hit].tolist(), dist[hit].tolist()):
+            if not (alive[a] and alive[b]):
+                continue
+            if self.response == "merge":
+                self._merge(system, a, b, r)
+            else:
+                self._bounce(system, a, b, r, radius)
+        system.touch()
+
+    def _merge(self, system, a, b, distance):
+        # the heavier body takes the other one in, momentum and the centre of mass are kept
+        pos, vel, mass = system.pos, system.vel, system.mass
+        if (mass[b], -b) > (mass[a], -a):
+            a, b = b, a
+        total = mass[a] + mass[b]
+        if total > 0:
+            pos[a] = (pos[a] * mass[a] + pos[b] * mass[b]) / total
+            vel[a] = (vel[a] * mass[a] + vel[b] * mass[b]) / total
+        mass[a] = total
+        # the index stays, the body becomes a massless point riding along with the survivor
+        mass[b] = 0
+        pos[b] = pos[a]
+        vel[b] = vel[a]
+        self.alive[b] = False
+        if system.sun == b:
+            system.sun = a
+        self._emit(Event(system.time, "merge", a, b, distance))
+
+    def _bounce(self, system, a, b, distance, radius):
+        # impulse along the line between the centres, split by mass so momentum is kept, and
+        # the overlap pushed apart the same way so the centre of mass stays put
+        pos, vel, mass = system.pos, system.vel, system.mass
+        total = mass[a] + mass[b]
+        normal = (pos[b] - pos[a]) / distance if distance > 0 else np.array([1.0, 0.0])
+        closing = float(np.dot(vel[b] - vel[a], normal))
+        wa = mass[b] / total
+        wb = mass[a] / total
+        if closing < 0:
+            impulse = (1 + self.restitution) * closing
+            vel[a] += wa * impulse * normal
+            vel[b] -= wb * impulse * normal
+        overlap = radius[a] + radius[b] - distance
+        pos[a] -= wa * overlap * normal
+        pos[b] += wb * overlap * normal
+        self._emit(Event(system.time, "bounce", a, b, distance))
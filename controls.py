@@ -0,0 +1,105 @@
+import numpy as np
+import pygame as pg
+
+
+class Widgets:
+    # clickable screen regions bucketed into a coarse grid, a click only looks at the
+    # regions registered in its own cell
+    CELL = 64
+
+    def __init__(self):
+        self.cells = {}
+        self.count = 0
+
+    def add(self, rect, down=None, up=None):
+        # down(event) fires once when the button goes down on the rect, up(event) when it is
+        # released again, wherever the mouse is by then. later rects sit on top
+        widget = (self.count, pg.Rect(rect), down, up)
+        self.count += 1
+        left, top = widget[1].left // self.CELL, widget[1].top // self.CELL
+        right, bottom = (widget[1].right - 1) // self.CELL, (widget[1].bottom - 1) // self.CELL
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                self.cells.setdefault((cx, cy), []).append(widget)
+        return widget
+
+    def at(self, pos):
+        best = None
+        for widget in self.cells.get((pos[0] // self.CELL, pos[1] // self.CELL), ()):
+            if widget[1].collidepoint(pos) and (best is None or widget[0] > best[0]):
+                best = widget
+        return best
+
+
+class Input:
+    # turns mouse button events into widget calls, a press is delivered exactly once no
+    # matter how long the button is held. clicks that miss every widget go to `fallback`
+    def __init__(self, widgets, fallback=None):
+        self.widgets = widgets
+        self.fallback = fallback
+        self.active = None
+
+    def handle(self, event):
+        if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+            widget = self.widgets.at(event.pos)
+            if widget is None:
+                if self.fallback is not None:
+                    self.fallback(event)
+                return
+            self.active = widget
+            if widget[2] is not None:
+                widget[2](event)
+        elif event.type == pg.MOUSEBUTTONUP and event.button == 1 and self.active is not None:
+            widget, self.active = self.active, None
+            if widget[3] is not None:
+                widget[3](event)
+
+
+class Picker:
+    # nearest body to a screen point. bodies are hashed into cells of `reach` pixels, a pick
+    # searches the 3x3 cells around the point, so it costs the same with 10 or 100k bodies on
+    # screen. the index is only built when somebody picks
+    def __init__(self, reach=12):
+        self.reach = reach
+        self.x = self.y = self.radius = self.hidden = None
+        self.keys = None
+
+    def update(self, x, y, radius, hidden=None):
+        # called every frame with the screen positions, cheap until the next pick
+        self.x, self.y, self.radius, self.hidden = x, y, radius, hidden
+        self.keys = None
+
+    def _build(self):
+        index = np.flatnonzero(np.isfinite(self.x) & np.isfinite(self.y))
+        if self.hidden is not None:
+            index = index[~self.hidden[index]]
+        cx = (self.x[index] // self.reach).astype(np.int64)
+        cy = (self.y[index] // self.reach).astype(np.int64)
+        keys = (cx << 32) + cy
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.index = index[order]
+        # big bodies can reach further than one cell, they are few and always checked
+        self.big = np.flatnonzero(self.radius >= self.reach)
+
+    def pick(self, pos):
+        # index of the body whose disc is closest to pos, within `reach` pixels of its edge
+        if self.x is None:
+            return None
+        if self.keys is None:
+            self._build()
+        cx, cy = pos[0] // self.reach, pos[1] // self.reach
+        found = []
+        for dx in (-1, 0, 1):
+            key = ((cx + dx) << 32) + cy
+            # the three cells of a column are next to each other in key order
+            first, last = np.searchsorted(self.keys, (key - 1, key + 2))
+            found.append(self.index[first:last])
+        found = np.union1d(np.concatenate(found), self.big)
+        if self.hidden is not None:
+            found = found[~self.hidden[found]]
+        if not len(found):
+            return None
+        gap = np.hypot(self.x[found] - pos[0], self.y[found] - pos[1]) - self.radius[found]
+        best = int(np.argmin(gap))
+        return int(found[best]) if gap[best] <= self.reach else None
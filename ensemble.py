@@ -0,0 +1,107 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from physics import AU, G, BodySystem
+from scenario import planetary_reset
+
+InitialConditions = namedtuple("InitialConditions", "pos vel mass")
+EnsembleResult = namedtuple("EnsembleResult", "initial final_pos final_vel count energy_drift escaped")
+
+# one row per run and body: x, y, x velocity, y velocity, mass
+FIELDS = 5
+
+
+def planetary():
+    system = BodySystem()
+    planetary_reset(system)
+    return InitialConditions(system.positions.copy(), system.velocities.copy(), system.masses.copy())
+
+
+def perturbed(base, runs, mass_sigma=0.0, vel_sigma=0.0, extra=0, seed=0):
+    # relative gaussian noise on masses and velocities, plus `extra` massless bodies on
+    # circular orbits around the first body between 1 and 40 AU
+    rng = np.random.default_rng(seed)
+    for _ in range(runs):
+        mass = base.mass * np.maximum(1 + mass_sigma * rng.standard_normal(len(base.mass)), 0)
+        vel = base.vel * (1 + vel_sigma * rng.standard_normal(base.vel.shape))
+        pos = base.pos.copy()
+        if extra:
+            r = AU * rng.uniform(1, 40, extra)
+            angle = rng.uniform(0, 2 * np.pi, extra)
+            speed = np.sqrt(G * mass[0] / r)
+            pos = np.concatenate([pos, base.pos[0] + np.c_[r * np.cos(angle), r * np.sin(angle)]])
+            vel = np.concatenate([vel, base.vel[0] + np.c_[-speed * np.sin(angle), speed * np.cos(angle)]])
+            mass = np.concatenate([mass, np.zeros(extra)])
+        yield InitialConditions(pos, vel, mass)
+
+
+def _run(task):
+    # runs in a worker, reads its initial conditions from and writes its results to shared memory
+    first, last, blocks, years, dt, options, escape = task
+    opened = [shared_memory.SharedMemory(name=name) for name, _ in blocks]
+    try:
+        _simulate(first, last, *(np.ndarray(shape, np.float64, shm.buf) for shm, (_, shape) in zip(opened, blocks)),
+                  years, dt, options, escape)
+    finally:
+        for shm in opened:
+            shm.close()
+    return last - first
+
+
+def _simulate(first, last, initial, final, scalars, years, dt, options, escape):
+    counts = scalars[:, 0].astype(int)
+    steps = max(1, round(years * 365.25 * 86400 / dt))
+    for run in range(first, last):
+        n = counts[run]
+        system = BodySystem(**options)
+        system.load(initial[run, :n, 0:2], initial[run, :n, 2:4], initial[run, :n, 4])
+        energy = system.energy()
+        for _ in range(steps):
+            system.step(dt)
+        final[run, :n, 0:2] = system.positions
+        final[run, :n, 2:4] = system.velocities
+        mass = system.masses
+        centre = (system.positions * mass[:, None]).sum(0) / mass.sum()
+        scalars[run, 1] = abs((system.energy() - energy) / energy)
+        scalars[run, 2] = np.count_nonzero(np.hypot(*(system.positions - centre).T) > escape)
+
+
+def run_ensemble(conditions, years, dt, workers=None, batch=None, escape=100 * AU, **options):
+    # fans the runs out over a process pool, `options` go to every BodySystem
+    conditions = list(conditions)
+    runs = len(conditions)
+    width = max(len(c.mass) for c in conditions)
+    shapes = [(runs, width, FIELDS), (runs, width, 4), (runs, 3)]
+    blocks = [shared_memory.SharedMemory(create=True, size=max(8, int(np.prod(shape)) * 8)) for shape in shapes]
+    try:
+        initial, final, scalars = (np.ndarray(shape, np.float64, shm.buf) for shm, shape in zip(blocks, shapes))
+        initial.fill(np.nan)
+        final.fill(np.nan)
+        for run, c in enumerate(conditions):
+            n = len(c.mass)
+            initial[run, :n, 0:2] = c.pos
+            initial[run, :n, 2:4] = c.vel
+            initial[run, :n, 4] = c.mass
+            scalars[run, 0] = n
+
+        workers = workers or os.cpu_count() or 1
+        # a few batches per worker keeps them all busy without paying a task per run
+        batch = batch or max(1, runs // (4 * workers))
+        names = [(shm.name, shape) for shm, shape in zip(blocks, shapes)]
+        tasks = [(first, min(first + batch, runs), names, years, dt, options, escape) for first in range(0, runs, batch)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_run, tasks):
+                pass
+
+        result = EnsembleResult(initial.copy(), final[..., 0:2].copy(), final[..., 2:4].copy(),
+                                scalars[:, 0].astype(int), scalars[:, 1].copy(), scalars[:, 2].astype(int))
+        del initial, final, scalars # the views must go before the blocks can be closed
+        return result
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
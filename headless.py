@@ -0,0 +1,217 @@
+import argparse, json, re, sys, time
+
+import numpy as np
+
+import bench, checkpoint, ensemble
+from collisions import RESPONSES, Collisions
+from integrators import INTEGRATORS
+from physics import SOLVERS, BodySystem
+from recorder import TrajectoryRecorder
+from scenario import load_scenario, reset
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "y": 365.25 * 86400}
+YEAR = UNITS["y"]
+MAX_OUT = 1 << 31 # bytes of samples kept in ram for --out, bigger runs should --record
+
+
+def duration(text):
+    # "3600", "90s", "30m", "1h", "1.5d", "2y" to seconds
+    match = re.fullmatch(r"\s*([0-9.]+(?:e[+-]?[0-9]+)?)\s*([smhdy]?)\s*", text.lower())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"not a duration: {text!r}")
+    seconds = float(match.group(1)) * UNITS[match.group(2) or "s"]
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"duration must be positive: {text!r}")
+    return seconds
+
+
+def simulate(system, steps, dt, every=0, report=None, recorder=None, checkpoint=None, checkpoint_every=0):
+    # runs as fast as numpy goes, returns sampled times, positions and velocities when every > 0,
+    # with a recorder the samples are streamed to disk instead of kept. checkpoint(system) is
+    # called every `checkpoint_every` steps
+    samples = steps // every if every and recorder is None else 0
+    times = np.empty(samples)
+    pos = np.empty((samples, system.n, 2))
+    vel = np.empty((samples, system.n, 2))
+    start = time.perf_counter()
+    last = start
+    for i in range(1, steps + 1):
+        system.step(dt)
+        if recorder is not None and i % every == 0:
+            recorder.record(system)
+        elif every and i % every == 0:
+            k = i // every - 1
+            times[k] = system.time
+            pos[k] = system.positions
+            vel[k] = system.velocities
+        if checkpoint is not None and checkpoint_every and i % checkpoint_every == 0:
+            checkpoint(system)
+        if report and i % 4096 == 0 and time.perf_counter() - last > 1:
+            last = time.perf_counter()
+            report(i, last - start)
+    return times, pos, vel
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="solar_system", description="solar system simulator")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sim = commands.add_parser("simulate", help="run the physics without a window")
+    sim.add_argument("--years", type=float, default=1.0)
+    sim.add_argument("--dt", type=duration, default=duration("1d"), help="step size, like 1h or 2d")
+    sim.add_argument("--sample", type=duration, default=duration("1d"), help="keep a state every this long, at least every step")
+    sim.add_argument("--out", help="write the sampled trajectory to this .npz file")
+    sim.add_argument("--record", help="stream the sampled trajectory into this directory, for runs too big for ram")
+    # the physics flags default to None so a --resume can tell which ones were given
+    sim.add_argument("--integrator", choices=tuple(INTEGRATORS), help="default leapfrog")
+    sim.add_argument("--solver", choices=SOLVERS, help="default direct")
+    sim.add_argument("--theta", type=float, help="barnes-hut opening angle, default 0.5")
+    sim.add_argument("--scenario", help="json scenario to load instead of the solar system")
+    sim.add_argument("--softening", type=float, help="plummer softening length in m, default 0")
+    sim.add_argument("--collisions", choices=RESPONSES, help="what bodies do when they touch, default nothing is checked")
+    sim.add_argument("--encounter", type=float, default=0.0, help="report bodies passing closer than this many m")
+    sim.add_argument("--events", help="write collisions and encounters to this .jsonl file")
+    sim.add_argument("--checkpoint", help="keep the latest full state in this file, written in the background")
+    sim.add_argument("--checkpoint-every", type=duration, default=duration("1y"), help="simulated time between checkpoints")
+    sim.add_argument("--resume", help="carry on from this checkpoint instead of starting the scenario over")
+    ens = commands.add_parser("ensemble", help="run many perturbed copies of the solar system in parallel")
+    ens.add_argument("--runs", type=int, default=100)
+    ens.add_argument("--years", type=float, default=100.0)
+    ens.add_argument("--dt", type=duration, default=duration("4d"))
+    ens.add_argument("--mass-sigma", type=float, default=0.01, help="relative spread of the masses")
+    ens.add_argument("--vel-sigma", type=float, default=0.001, help="relative spread of the velocities")
+    ens.add_argument("--extra", type=int, default=0, help="massless bodies added to every run")
+    ens.add_argument("--seed", type=int, default=0)
+    ens.add_argument("--workers", type=int, default=None, help="processes, default one per core")
+    ens.add_argument("--out", help="write initial and final states to this .npz file")
+    ens.add_argument("--integrator", choices=tuple(INTEGRATORS), default="leapfrog")
+    ben = commands.add_parser("bench", help="time the physics and the window for scenes of growing size")
+    ben.add_argument("--bodies", type=int, nargs="+", default=bench.SCENES, help="scene sizes, default %(default)s")
+    ben.add_argument("--seconds", type=float, default=1.0, help="time spent measuring each scene")
+    ben.add_argument("--integrator", choices=tuple(INTEGRATORS), default="leapfrog")
+    ben.add_argument("--solver", choices=SOLVERS, default="direct")
+    ben.add_argument("--massive", action="store_true", help="give the asteroids mass, use barnes_hut for big scenes")
+    ben.add_argument("--no-window", dest="window", action="store_false", help="skip the frame timings")
+    ben.add_argument("--out", help="write the results to this .json file, default stdout")
+    args = parser.parse_args(argv)
+    if args.command == "ensemble":
+        return run_ensemble(args)
+    if args.command == "bench":
+        return run_bench(args)
+
+    physics = {"solver": args.solver, "theta": args.theta, "integrator": args.integrator, "softening": args.softening}
+    if args.resume:
+        # the checkpoint brings its own physics, flags that say otherwise are a mistake
+        header = checkpoint.read(args.resume)[0]
+        conflicts = [f"--{key} {value}" for key, value in physics.items() if value is not None and value != header[key]]
+        if conflicts:
+            sim.error(f"{args.resume} carries on with {', '.join(f'--{key} {header[key]}' for key in physics)}, "
+                      f"drop {', '.join(conflicts)} or start the run over")
+    defaults = {"solver": "direct", "theta": 0.5, "integrator": "leapfrog", "softening": 0.0}
+    system = BodySystem(**{key: defaults[key] if value is None else value for key, value in physics.items()})
+    events = None
+    if args.collisions or args.encounter:
+        system.collisions = Collisions(args.collisions or "none", encounter=args.encounter)
+        if args.events:
+            events = open(args.events, "w")
+            system.collisions.hooks.append(lambda event: events.write(json.dumps(event._asdict()) + "\n"))
+    if args.resume:
+        names = checkpoint.restore(system, args.resume)
+    else:
+        names = reset(system, load_scenario(args.scenario))
+    steps = max(1, round(args.years * YEAR / args.dt))
+    every = 0
+    if args.out or args.record:
+        every = max(1, round(args.sample / args.dt))
+    if args.out and args.record:
+        sim.error("--out keeps the samples in ram and --record streams them to disk, pick one")
+    if args.out and steps // every * system.n * 32 > MAX_OUT:
+        sim.error(f"--out would keep {steps // every * system.n * 32 / 1e9:.1f} GB of samples in ram, "
+                     f"sample less often or stream them with --record")
+    recorder = None
+    if args.record:
+        recorder = TrajectoryRecorder(args.record, system, every * args.dt, names)
+    checkpointer = save = None
+    checkpoint_every = 0
+    if args.checkpoint:
+        checkpointer = checkpoint.Checkpointer()
+        save = lambda system: checkpointer.save(args.checkpoint, system, names)
+        checkpoint_every = max(1, round(args.checkpoint_every / args.dt))
+
+    energy = system.energy()
+    def report(i, elapsed):
+        print(f"  {i}/{steps} steps, {i / elapsed:,.0f} steps/s", file=sys.stderr)
+    start = time.perf_counter()
+    try:
+        times, pos, vel = simulate(system, steps, args.dt, every, report, recorder,
+                                   save, checkpoint_every)
+        if save is not None:
+            save(system)
+    finally:
+        if checkpointer is not None:
+            checkpointer.close()
+        if recorder is not None:
+            recorder.close()
+        if events is not None:
+            events.close()
+    elapsed = time.perf_counter() - start
+    if args.out:
+        # before any reporting, nothing printed below can lose a finished run
+        np.savez(args.out, time=times, pos=pos, vel=vel, mass=system.masses.copy(), names=np.array(names), dt=args.dt)
+    # relative to the starting energy, absolute in J when that is 0 (a sun and massless bodies)
+    drift = abs(system.energy() - energy)
+    drift = f"energy drift {drift / abs(energy):.2e}" if energy else f"energy drift {drift:.2e} J"
+
+    years = steps * args.dt / YEAR
+    print(f"{steps} steps of {args.dt:g}s ({years:g} years) with {system.n} bodies in {elapsed:.3f}s")
+    print(f"{steps / elapsed:,.0f} steps/s, {elapsed / years * 1000:.2f} ms per simulated year, "
+          f"{system.integrator.evaluations} force evaluations, {drift}")
+    if system.collisions is not None:
+        alive = system.collisions.alive
+        print(f"{system.n - np.count_nonzero(alive) if len(alive) else 0} bodies merged away"
+              + (f", events in {args.events}" if args.events else ""))
+    if args.out:
+        print(f"wrote {len(times)} states to {args.out}")
+    if args.checkpoint:
+        if checkpointer.error is not None:
+            print(f"could not write {args.checkpoint}: {checkpointer.error}", file=sys.stderr)
+            return 1
+        print(f"checkpoint at year {system.time / YEAR:g} in {args.checkpoint}")
+    if args.record:
+        print(f"recorded {recorder.steps} states to {args.record}")
+    return 0
+
+
+def run_ensemble(args):
+    conditions = ensemble.perturbed(ensemble.planetary(), args.runs, args.mass_sigma, args.vel_sigma, args.extra, args.seed)
+    start = time.perf_counter()
+    result = ensemble.run_ensemble(conditions, args.years, args.dt, args.workers, integrator=args.integrator)
+    elapsed = time.perf_counter() - start
+    steps = args.runs * max(1, round(args.years * YEAR / args.dt))
+    print(f"{args.runs} runs of {args.years:g} years in {elapsed:.2f}s, {steps / elapsed:,.0f} steps/s over all workers")
+    print(f"energy drift median {np.median(result.energy_drift):.2e} max {result.energy_drift.max():.2e}, "
+          f"{np.count_nonzero(result.escaped)} runs lost a body")
+    if args.out:
+        np.savez(args.out, **result._asdict())
+        print(f"wrote {args.out}")
+    return 0
+
+
+def run_bench(args):
+    def report(kind, result):
+        if kind == "physics":
+            print(f"{result['bodies']:>7} bodies {result['steps_per_s']:>10,.1f} steps/s "
+                  f"{result['allocations_per_step']['peak_bytes']:>12,} B peak per step", file=sys.stderr)
+        else:
+            print(f"{result['bodies']:>7} bodies {'threaded' if result['threaded'] else 'in frame'} frame p50 {result['frame']['p50_ms']:.2f} ms "
+                  f"p99 {result['frame']['p99_ms']:.2f} ms", file=sys.stderr)
+    results = bench.run(args.bodies, args.seconds, args.solver, args.integrator, args.massive, args.window, report)
+    if args.out:
+        bench.write(results, args.out)
+        print(f"wrote {args.out}", file=sys.stderr)
+    else:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
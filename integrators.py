@@ -0,0 +1,193 @@
+import numpy as np
+
+
+class Integrator:
+    # advances every body of a BodySystem together, subclasses only implement advance
+    def __init__(self):
+        self.evaluations = 0
+
+    def acc(self, system, pos):
+        self.evaluations += 1
+        return system.accelerations(pos)
+
+    def reset(self):
+        # called whenever the bodies were changed from outside, drops anything cached
+        pass
+
+    def state(self):
+        # what it takes to carry on with exactly the same next step, numbers and arrays
+        return {"evaluations": self.evaluations}
+
+    def load_state(self, state):
+        self.evaluations = int(state.get("evaluations", 0))
+
+    def step(self, system, dt):
+        self.advance(system, system.positions, system.velocities, dt)
+
+    def advance(self, system, pos, vel, dt):
+        raise NotImplementedError
+
+
+class Euler(Integrator):
+    # semi-implicit euler, what Planet.update used to do, now for all bodies at once
+    def advance(self, system, pos, vel, dt):
+        vel += self.acc(system, pos) * dt
+        pos += vel * dt
+
+
+class Leapfrog(Integrator):
+    # kick-drift-kick velocity verlet, the closing force is reused as the next opening kick
+    def __init__(self):
+        super().__init__()
+        self.last = None
+
+    def reset(self):
+        self.last = None
+
+    def state(self):
+        state = super().state()
+        if self.last is not None:
+            state["last"] = self.last.copy()
+        return state
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.last = np.array(state["last"]) if "last" in state else None
+
+    def advance(self, system, pos, vel, dt):
+        if self.last is None or len(self.last) != len(pos):
+            self.last = self.acc(system, pos)
+        vel += self.last * (dt / 2)
+        pos += vel * dt
+        self.last = self.acc(system, pos)
+        vel += self.last * (dt / 2)
+
+
+class Yoshida4(Integrator):
+    # 4th order symplectic drift-kick composition, three force evaluations per step
+    W1 = 1 / (2 - 2 ** (1 / 3))
+    W0 = -2 ** (1 / 3) * W1
+    DRIFT = (W1 / 2, (W0 + W1) / 2, (W0 + W1) / 2, W1 / 2)
+    KICK = (W1, W0, W1)
+
+    def advance(self, system, pos, vel, dt):
+        for c, d in zip(self.DRIFT, self.KICK):
+            pos += vel * (c * dt)
+            vel += self.acc(system, pos) * (d * dt)
+        pos += vel * (self.DRIFT[3] * dt)
+
+
+class RK45(Integrator):
+    # dormand-prince 5(4) with step size control. the steps are as long as the error allows,
+    # shorter or longer than the dt asked for: the states in between are read off a quintic
+    # hermite through the positions, velocities and accelerations at both ends of the step
+    # the integration is in, which the integration itself never sees
+    A = (
+        (),
+        (1/5,),
+        (3/40, 9/40),
+        (44/45, -56/15, 32/9),
+        (19372/6561, -25360/2187, 64448/6561, -212/729),
+        (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+        (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+    )
+    E = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+    SPAN = ("x0", "v0", "a0", "x1", "v1", "a1")
+
+    def __init__(self, rtol=1e-9, safety=0.9):
+        super().__init__()
+        self.rtol = rtol
+        self.safety = safety
+        self.h = None
+        self.reset()
+
+    def reset(self):
+        # the step the system is in: its length, how far into it the system is and the
+        # states at both ends
+        self.span = None
+        self.length = self.at = 0.0
+
+    def state(self):
+        state = super().state()
+        state["rtol"] = self.rtol
+        state["safety"] = self.safety
+        if self.h is not None:
+            state["h"] = self.h
+        if self.span is not None:
+            state["length"] = self.length
+            state["at"] = self.at
+            state.update((name, array.copy()) for name, array in zip(self.SPAN, self.span))
+        return state
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.rtol = float(state.get("rtol", self.rtol))
+        self.safety = float(state.get("safety", self.safety))
+        self.h = float(state["h"]) if "h" in state else None
+        self.reset()
+        if "x0" in state:
+            self.span = tuple(np.array(state[name]) for name in self.SPAN)
+            self.length = float(state["length"])
+            self.at = float(state["at"])
+
+    def _step(self, system, x0, v0, a0):
+        # one accepted step from (x0, v0) with acceleration a0, tried again shorter until the
+        # error fits. returns the end state and its acceleration, first same as last
+        h = self.h
+        while True:
+            k = [(v0, a0)]
+            for row in self.A[1:]:
+                x = x0 + h * sum(a * kx for a, (kx, _) in zip(row, k) if a)
+                v = v0 + h * sum(a * kv for a, (_, kv) in zip(row, k) if a)
+                k.append((v, self.acc(system, x)))
+            ex = h * sum(e * kx for e, (kx, _) in zip(self.E, k) if e)
+            ev = h * sum(e * kv for e, (_, kv) in zip(self.E, k) if e)
+            # error against the size of the whole position and velocity blocks, bodies at rest are fine
+            scale_x = self.rtol * max(np.abs(x0).max(initial=0), np.abs(x).max(initial=0), 1.0)
+            scale_v = self.rtol * max(np.abs(v0).max(initial=0), np.abs(v).max(initial=0), 1e-300)
+            err = max(np.abs(ex).max(initial=0) / scale_x, np.abs(ev).max(initial=0) / scale_v)
+            step = h
+            self.h = h = h * min(5.0, max(0.2, self.safety * err ** -0.2 if err > 0 else 5.0))
+            if err <= 1:
+                return step, x, v, k[-1][1]
+
+    def advance(self, system, pos, vel, dt):
+        if self.h is None:
+            self.h = dt
+        if self.span is None or len(self.span[0]) != len(pos):
+            x = pos.copy()
+            v = vel.copy()
+            a = self.acc(system, x)
+            self.span = (x, v, a, x, v, a)
+            self.length = self.at = 0.0
+        self.at += dt
+        while self.at > self.length:
+            self.at -= self.length
+            x0, v0, a0 = self.span[3:]
+            self.length, x1, v1, a1 = self._step(system, x0, v0, a0)
+            self.span = (x0, v0, a0, x1, v1, a1)
+        self._interpolate(pos, vel)
+
+    def _interpolate(self, pos, vel):
+        x0, v0, a0, x1, v1, a1 = self.span
+        if self.at == self.length:
+            pos[...] = x1
+            vel[...] = v1
+            return
+        L = self.length
+        s = self.at / L
+        s2, s3, s4, s5 = s * s, s ** 3, s ** 4, s ** 5
+        pos[...] = ((1 - 10*s3 + 15*s4 - 6*s5) * x0 + (10*s3 - 15*s4 + 6*s5) * x1
+                    + L * ((s - 6*s3 + 8*s4 - 3*s5) * v0 + (-4*s3 + 7*s4 - 3*s5) * v1)
+                    + L * L * ((s2/2 - 1.5*s3 + 1.5*s4 - s5/2) * a0 + (s3/2 - s4 + s5/2) * a1))
+        vel[...] = ((-30*s2 + 60*s3 - 30*s4) / L * (x0 - x1)
+                    + (1 - 18*s2 + 32*s3 - 15*s4) * v0 + (-12*s2 + 28*s3 - 15*s4) * v1
+                    + L * ((s - 4.5*s2 + 6*s3 - 2.5*s4) * a0 + (1.5*s2 - 4*s3 + 2.5*s4) * a1))
+
+
+INTEGRATORS = {
+    "euler": Euler,
+    "leapfrog": Leapfrog,
+    "yoshida4": Yoshida4,
+    "rk45": RK45,
+}
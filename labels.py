@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+import pygame as pg
+
+
+class LabelCache:
+    # font.render is the slowest thing we do per frame, so every label is rendered once and
+    # kept in an lru, and numbers are put together from cached digit glyphs
+    GLYPHS = "0123456789.-e+"
+
+    def __init__(self, font, size=256):
+        self.font = font
+        self.size = size
+        self.surfaces = OrderedDict()
+        self.glyphs = {}
+        self.renders = 0
+
+    def _get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def _put(self, key, surface):
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def text(self, text, color):
+        key = ("text", text, color)
+        surface = self._get(key)
+        if surface is None:
+            self.renders += 1
+            surface = self._put(key, self.font.render(text, 1, color))
+        return surface
+
+    def glyph(self, char, color):
+        key = (char, color)
+        surface = self.glyphs.get(key)
+        if surface is None:
+            self.renders += 1
+            surface = self.glyphs[key] = self.font.render(char, 1, color)
+        return surface
+
+    def compose(self, parts, color):
+        # parts are (text, static), static parts are cached whole, the rest glyph by glyph
+        key = ("compose", parts, color)
+        surface = self._get(key)
+        if surface is not None:
+            return surface
+        pieces = []
+        for text, static in parts:
+            if static or any(char not in self.GLYPHS for char in text):
+                pieces.append(self.text(text, color))
+            else:
+                pieces.extend(self.glyph(char, color) for char in text)
+        surface = pg.Surface((sum(p.get_width() for p in pieces), self.font.get_height()), pg.SRCALPHA)
+        x = 0
+        for piece in pieces:
+            surface.blit(piece, (x, 0))
+            x += piece.get_width()
+        return self._put(key, surface)
+
+    def value(self, prefix, number, suffix, color):
+        # "prefix number suffix", only re-composed when the printed number changes
+        return self.compose(((prefix, True), (str(number), False), (suffix, True)), color)
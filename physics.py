@@ -0,0 +1,179 @@
+import numpy as np
+
+import barnes_hut
+from integrators import INTEGRATORS, Integrator
+
+AU = 149.6e6*1000
+G = 6.67428e-11
+SOLVERS = ("direct", "barnes_hut")
+
+
+class BodySystem:
+    # every body lives in one row of these arrays, Planet objects only hold the row index
+    CHUNK = 1 << 16 # pair interactions per numpy pass, small enough to stay in cache
+
+    def __init__(self, capacity=16, solver="direct", theta=0.5, integrator="leapfrog", softening=0.0):
+        if solver not in SOLVERS:
+            raise ValueError(f"unknown solver {solver!r}, pick one of {SOLVERS}")
+        self.solver = solver
+        self.integrator = integrator
+        self.theta = theta # barnes-hut opening angle, 0 is exact, bigger is faster and rougher
+        self.softening = softening # plummer length in m, forces go as r / (r² + eps²)^1.5
+        self.collisions = None # a collisions.Collisions, checked after every step
+        self.n = 0
+        self.time = 0.0
+        self.sun = -1
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.mass = np.zeros(capacity)
+        self._sources = None
+
+    @property
+    def integrator(self):
+        return self._integrator
+
+    @integrator.setter
+    def integrator(self, integrator):
+        if isinstance(integrator, str):
+            if integrator not in INTEGRATORS:
+                raise ValueError(f"unknown integrator {integrator!r}, pick one of {tuple(INTEGRATORS)}")
+            integrator = INTEGRATORS[integrator]()
+        elif not isinstance(integrator, Integrator):
+            raise TypeError(f"expected an Integrator or its name, got {type(integrator).__name__}")
+        self._integrator = integrator
+
+    def touch(self):
+        # the arrays were edited from outside, nothing cached from them can be trusted
+        self._sources = None
+        self._integrator.reset()
+
+    def _grow(self, capacity):
+        for name in ("pos", "vel", "mass"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def add(self, x, y, mass, x_vel=0, y_vel=0):
+        if self.n == len(self.mass):
+            self._grow(2 * len(self.mass))
+        i = self.n
+        self.pos[i] = x, y
+        self.vel[i] = x_vel, y_vel
+        self.mass[i] = mass
+        self.n += 1
+        self.touch()
+        return i
+
+    def extend(self, pos, vel, mass):
+        # appends many bodies at once, returns the index of the first one
+        first = self.n
+        n = first + len(mass)
+        if n > len(self.mass):
+            self._grow(max(n, 2 * len(self.mass)))
+        self.pos[first:n] = pos
+        self.vel[first:n] = vel
+        self.mass[first:n] = mass
+        self.n = n
+        self.touch()
+        return first
+
+    def load(self, pos, vel, mass):
+        # replaces every body with copies of the given arrays, no per body work
+        self.n = 0
+        self.time = 0.0
+        if self.collisions is not None:
+            self.collisions.reset()
+        self.extend(pos, vel, mass)
+
+    def clear(self):
+        self.n = 0
+        self.time = 0.0
+        self.sun = -1
+        if self.collisions is not None:
+            self.collisions.reset()
+        self.touch()
+
+    @property
+    def positions(self):
+        return self.pos[:self.n]
+
+    @property
+    def velocities(self):
+        return self.vel[:self.n]
+
+    @property
+    def masses(self):
+        return self.mass[:self.n]
+
+    def accelerations(self, pos=None):
+        if pos is None:
+            pos = self.positions
+        if self.solver == "barnes_hut":
+            return G * barnes_hut.accelerations(pos, self.masses, self.theta, self.softening)
+        return self.direct_accelerations(pos)
+
+    def sources(self):
+        # only bodies with mass pull on others, massless test particles cost O(N) instead of O(N²)
+        if self._sources is None:
+            self._sources = np.flatnonzero(self.masses)
+            self._source_gm = G * self.mass[self._sources]
+        return self._sources
+
+    def direct_accelerations(self, pos):
+        src = self.sources()
+        if len(src) == 0:
+            return np.zeros_like(pos)
+        acc = np.empty_like(pos)
+        src_x = pos[src, 0]
+        src_y = pos[src, 1]
+        rows = max(1, self.CHUNK // len(src))
+        for start in range(0, len(pos), rows):
+            stop = start + rows
+            dx = src_x - pos[start:stop, 0:1]
+            dy = src_y - pos[start:stop, 1:2]
+            r2 = dx * dx
+            r2 += dy * dy
+            if self.softening:
+                r2 += self.softening ** 2 # dx and dy are still 0 for the body itself
+            w = np.sqrt(r2)
+            w *= r2
+            w[r2 == 0] = np.inf # a body does not pull on itself
+            np.divide(self._source_gm, w, out=w)
+            dx *= w
+            dy *= w
+            dx.sum(1, out=acc[start:stop, 0])
+            dy.sum(1, out=acc[start:stop, 1])
+        return acc
+
+    def step(self, dt):
+        self._integrator.step(self, dt)
+        self.time += dt
+        if self.collisions is not None:
+            self.collisions.check(self)
+
+    def energy(self):
+        mass = self.masses
+        vel = self.velocities
+        kinetic = 0.5 * float(np.einsum("i,ij,ij->", mass, vel, vel))
+        pos = self.positions
+        src = np.flatnonzero(mass)
+        potential = 0.0
+        rows = max(1, self.CHUNK // max(len(src), 1))
+        for start in range(0, len(src), rows):
+            i = src[start:start+rows]
+            d = pos[src] - pos[i, None]
+            r = np.hypot(d[..., 0], d[..., 1])
+            same = r == 0
+            if self.softening:
+                r = np.hypot(r, self.softening)
+            with np.errstate(divide="ignore"):
+                pair = mass[i, None] * mass[src] / r
+            pair[same] = 0
+            potential -= 0.5 * G * float(pair.sum())
+        return kinetic + potential
+
+    def dist_to_sun(self, i):
+        if self.sun < 0:
+            return 0
+        return float(np.hypot(*(self.pos[self.sun] - self.pos[i])))
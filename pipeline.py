@@ -0,0 +1,158 @@
+import threading, time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Snapshot:
+    # one consistent state of the simulation, everything a frame needs to draw it. nothing in
+    # here changes while a frame looks at it
+    __slots__ = ("time", "steps", "sun", "pos", "vel", "alive", "trails", "alpha", "previous", "owed", "warp", "wall")
+
+    def __init__(self, time=0.0, steps=0, sun=-1, pos=None, vel=None, alive=None, trails=None, alpha=1.0):
+        self.time = time
+        self.steps = steps # physics steps taken so far
+        self.sun = sun
+        self.pos = pos
+        self.vel = vel
+        self.alive = alive # None while nothing merged away
+        self.trails = trails # (planets, samples, 2)
+        self.alpha = alpha # how far pos is from the state before the last step to the last one
+        # published by the physics thread: the positions before the last step, the simulated
+        # seconds owed then, the warp and the wall time, enough to place the bodies at any moment
+        self.previous = None
+        self.owed = 0.0
+        self.warp = 0.0
+        self.wall = 0.0
+
+    def at(self, now, dt):
+        # the published state as it should look at wall time `now`, interpolated between the
+        # last two steps just like the single thread loop does, never past the newest one
+        alpha = min((self.owed + (now - self.wall) * self.warp) / dt, 1.0)
+        if self.previous is None or alpha >= 1:
+            return Snapshot(self.time, self.steps, self.sun, self.pos, self.vel, self.alive, self.trails)
+        pos = self.previous + (self.pos - self.previous) * alpha
+        return Snapshot(self.time, self.steps, self.sun, pos, self.vel, self.alive, self.trails, alpha)
+
+    def fill(self, system, steps, trails=None, previous=None, owed=0.0, warp=0.0):
+        # copies the system in, reusing the arrays of the last time this slot was filled
+        self.time = system.time
+        self.steps = steps
+        self.sun = system.sun
+        self.pos = _copy(self.pos, system.positions)
+        self.previous = None if previous is None else _copy(self.previous, previous)
+        self.owed = owed
+        self.warp = warp
+        self.wall = time.perf_counter()
+        self.vel = _copy(self.vel, system.velocities)
+        collisions = system.collisions
+        if collisions is not None and len(collisions.alive) == system.n and not collisions.alive.all():
+            self.alive = _copy(self.alive, collisions.alive)
+        else:
+            self.alive = None
+        if trails is not None:
+            self.trails = _copy(self.trails, trails.points())
+
+
+def _copy(into, array):
+    if into is None or into.shape != array.shape:
+        return array.copy()
+    np.copyto(into, array)
+    return into
+
+
+class PhysicsThread:
+    # steps a BodySystem on a thread of its own, `warp` simulated seconds per wall second in
+    # fixed steps of `dt`, however fast the window draws. every batch of steps ends in a
+    # Snapshot: the thread fills one slot, hands it over as the ready one and takes the slot
+    # the reader gave back, so the reader always gets the latest complete state and neither
+    # side ever waits on the other. `after_step(system)` runs after every step on this thread
+    BATCH = 1/240 # wall time spent stepping before the next snapshot goes out
+    MAX_LAG = 0.25 # wall seconds of simulation it catches up on, the rest is dropped
+
+    def __init__(self, system, dt, trails=None, after_step=None):
+        self.system = system
+        self.dt = dt
+        self.trails = trails
+        self.after_step = after_step
+        self.warp = 0.0
+        self.published = 0.0 # warp of the last snapshot
+        self.steps = 0
+        self.previous = None # positions before the last step
+        self.owed = 0.0 # simulated seconds due but not stepped yet
+        self.error = None
+        # held while stepping, take it through editing() to touch the system from outside
+        self.lock = threading.Lock()
+        self.slots = [Snapshot() for _ in range(3)]
+        self.back, self.ready, self.front = 0, 1, 2
+        self.fresh = False
+        self.swap = threading.Lock()
+        self.running = True
+        self.publish()
+        self.latest()
+        self.thread = threading.Thread(target=self._run, name="physics", daemon=True)
+        self.thread.start()
+
+    def publish(self):
+        # with the lock held, or before the thread runs
+        self.published = self.warp
+        self.slots[self.back].fill(self.system, self.steps, self.trails, self.previous, self.owed, self.published)
+        with self.swap:
+            self.back, self.ready = self.ready, self.back
+            self.fresh = True
+
+    def latest(self):
+        # the newest complete snapshot, it stays untouched until the next call
+        if self.error is not None:
+            raise self.error
+        with self.swap:
+            if self.fresh:
+                self.front, self.ready = self.ready, self.front
+                self.fresh = False
+        return self.slots[self.front]
+
+    @contextmanager
+    def editing(self):
+        # the thread is held between two steps while the system is changed from outside, the
+        # result is published right away so it shows even while paused
+        with self.lock:
+            yield self.system
+            self.owed = 0.0
+            self.previous = None
+            self.publish()
+
+    def _run(self):
+        last = time.perf_counter()
+        try:
+            while self.running:
+                now = time.perf_counter()
+                warp = self.warp
+                self.owed = min(self.owed + (now - last) * warp, self.MAX_LAG * warp + self.dt)
+                last = now
+                if warp != self.published:
+                    # paused or warped, the window has to know to keep interpolating right
+                    with self.lock:
+                        self.publish()
+                if self.owed < self.dt:
+                    # nothing due yet, sleep until the next step is or a little while when paused
+                    time.sleep(min((self.dt - self.owed) / warp, self.BATCH) if warp > 0 else self.BATCH)
+                    continue
+                with self.lock:
+                    while self.owed >= self.dt:
+                        self.previous = _copy(self.previous, self.system.positions)
+                        self.system.step(self.dt)
+                        self.steps += 1
+                        if self.after_step is not None:
+                            self.after_step(self.system)
+                        self.owed -= self.dt
+                        if time.perf_counter() - now > self.BATCH:
+                            break
+                    self.publish()
+                # lets the window thread have the interpreter before the next batch
+                time.sleep(0)
+        except Exception as error:
+            self.error = error
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
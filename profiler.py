@@ -0,0 +1,91 @@
+import csv, json, time
+
+import numpy as np
+
+
+class Profiler:
+    # lap timer for the phases of a frame. `lap(name)` books the time since the previous lap
+    # to `name`, `end()` closes the frame into ring buffers of the last `history` frames.
+    # hooks only cost something when there are any
+    def __init__(self, phases, history=240):
+        self.phases = tuple(phases)
+        self.column = {name: i for i, name in enumerate(self.phases)}
+        self.history = history
+        self.times = np.zeros((history, len(self.phases)))
+        self.counters = {}
+        self.frames = 0
+        self.hooks = []
+        self.current = np.zeros(len(self.phases))
+        self.last = time.perf_counter()
+
+    def begin(self):
+        self.current[:] = 0
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.current[self.column[name]] += now - self.last
+        self.last = now
+
+    def end(self, **counters):
+        self.times[self.frames % self.history] = self.current
+        self.counters = counters
+        self.frames += 1
+        if self.hooks:
+            sample = dict(zip(self.phases, self.current.tolist()))
+            for hook in self.hooks:
+                hook(self.frames, sample, counters)
+
+    def recent(self):
+        # seconds per phase for the frames in the buffer, oldest first
+        if self.frames < self.history:
+            return self.times[:self.frames]
+        return np.roll(self.times, -(self.frames % self.history), axis=0)
+
+    def stats(self):
+        # name -> (mean, p99) in milliseconds over the buffer, "frame" is the sum of all phases
+        times = self.recent() * 1e3
+        if not len(times):
+            return {}
+        columns = dict(zip(self.phases, times.T))
+        columns["frame"] = times.sum(1)
+        return {name: (float(column.mean()), float(np.percentile(column, 99))) for name, column in columns.items()}
+
+    def histogram(self, name="frame", bins=20, top=50.0):
+        # counts of the buffered frames over `bins` equal bins from 0 to `top` ms, the last
+        # bin also takes everything slower
+        times = self.recent() * 1e3
+        column = times.sum(1) if name == "frame" else times[:, self.column[name]]
+        return np.histogram(np.minimum(column, top), bins, (0, top))[0]
+
+
+class _FileHook:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+
+    def close(self):
+        self.file.close()
+
+
+class CsvHook(_FileHook):
+    # one row per frame, phases in seconds then the counters
+    def __init__(self, path):
+        super().__init__(path)
+        self.writer = csv.writer(self.file)
+        self.header = None
+
+    def __call__(self, frame, phases, counters):
+        if self.header is None:
+            self.header = ["frame", *phases, *counters]
+            self.writer.writerow(self.header)
+        self.writer.writerow([frame, *phases.values(), *counters.values()])
+
+
+class JsonlHook(_FileHook):
+    def __call__(self, frame, phases, counters):
+        self.file.write(json.dumps({"frame": frame, **phases, **counters}) + "\n")
+
+
+def file_hook(path):
+    # picks the format from the extension
+    return JsonlHook(path) if path.endswith((".jsonl", ".json")) else CsvHook(path)
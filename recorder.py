@@ -0,0 +1,130 @@
+import json, os
+from collections import OrderedDict
+
+import numpy as np
+
+VERSION = 1
+HEADER = "header.json"
+CHUNK_ROWS = 4096
+CHUNK_BYTES = 64 << 20 # a row is 32 bytes a body, big scenes get fewer rows per chunk
+
+
+def _chunk_name(i):
+    return f"chunk_{i:06d}.npy"
+
+
+class TrajectoryRecorder:
+    # streams one (positions, velocities) row per step into fixed size memory mapped .npy
+    # chunks, only the chunk being written is mapped so nothing piles up in ram
+    def __init__(self, path, system, dt, names=(), chunk=None):
+        self.path = path
+        self.dt = dt
+        self.bodies = system.n
+        if chunk is None:
+            chunk = min(CHUNK_ROWS, max(1, CHUNK_BYTES // (32 * max(self.bodies, 1))))
+        self.chunk = chunk
+        self.steps = 0
+        self.current = None
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("chunk_") and name.endswith(".npy"):
+                os.remove(os.path.join(path, name))
+        self.header = {
+            "version": VERSION,
+            "bodies": self.bodies,
+            "names": list(names),
+            "mass": system.masses.tolist(),
+            "t0": system.time,
+            "dt": dt,
+            "chunk": chunk,
+            "steps": 0,
+        }
+        self._write_header()
+
+    def _write_header(self):
+        self.header["steps"] = self.steps
+        tmp = os.path.join(self.path, HEADER + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.header, f)
+        os.replace(tmp, os.path.join(self.path, HEADER))
+
+    def record(self, system):
+        if system.n != self.bodies:
+            raise ValueError(f"recording {self.bodies} bodies, the system now has {system.n}")
+        if self.steps == 0:
+            self.header["t0"] = system.time
+        row = self.steps % self.chunk
+        if row == 0:
+            self._open(self.steps // self.chunk)
+        self.current[row, 0] = system.positions
+        self.current[row, 1] = system.velocities
+        self.steps += 1
+        if row == self.chunk - 1:
+            # a finished chunk is flushed and the header moved on, so a crash loses at most one chunk
+            self.current.flush()
+            self._write_header()
+
+    def _open(self, i):
+        if self.current is not None:
+            self.current.flush()
+        self.current = np.lib.format.open_memmap(
+            os.path.join(self.path, _chunk_name(i)), mode="w+", dtype=np.float64, shape=(self.chunk, 2, self.bodies, 2))
+
+    def close(self):
+        if self.current is not None:
+            self.current.flush()
+            self.current = None
+        self._write_header()
+
+
+class TrajectoryReader:
+    # random access into a recorded run, any step is one index computation plus a memory map read
+    OPEN_CHUNKS = 4
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, HEADER)) as f:
+            self.header = json.load(f)
+        if self.header["version"] != VERSION:
+            raise ValueError(f"{path} is trajectory version {self.header['version']}, expected {VERSION}")
+        self.bodies = self.header["bodies"]
+        self.names = self.header["names"]
+        self.mass = np.array(self.header["mass"])
+        self.t0 = self.header["t0"]
+        self.dt = self.header["dt"]
+        self.chunk = self.header["chunk"]
+        self.steps = self.header["steps"]
+        if self.steps == 0:
+            raise ValueError(f"{path} is an empty recording, it was stopped before the first step")
+        self.chunks = OrderedDict()
+
+    @property
+    def t1(self):
+        return self.t0 + self.dt * max(self.steps - 1, 0)
+
+    def _rows(self, i):
+        chunk, row = divmod(i, self.chunk)
+        data = self.chunks.get(chunk)
+        if data is None:
+            data = np.load(os.path.join(self.path, _chunk_name(chunk)), mmap_mode="r")
+            self.chunks[chunk] = data
+            if len(self.chunks) > self.OPEN_CHUNKS:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(chunk)
+        return data[row]
+
+    def state(self, i):
+        if not 0 <= i < self.steps:
+            raise IndexError(f"step {i} outside the recording of {self.steps} steps")
+        row = self._rows(i)
+        return row[0], row[1]
+
+    def positions_at(self, t):
+        # linear between the two recorded steps around t, clamped to the recording
+        x = min(max((t - self.t0) / self.dt, 0.0), self.steps - 1)
+        i = int(x)
+        pos = self._rows(i)[0]
+        if i + 1 >= self.steps or x == i:
+            return np.array(pos)
+        return pos + (self._rows(i + 1)[0] - pos) * (x - i)
@@ -0,0 +1,187 @@
+import numpy as np
+import pygame as pg
+
+
+class Renderer:
+    # draws straight onto the screen over a cached background layer and only sends the
+    # rects that changed to the display. moving things are erased and redrawn every frame,
+    # sprites (labels) stay on screen until their surface changes
+    MAX_RECTS = 128 # past this many rects one full update is cheaper
+
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.dirty = []
+        self.erased = []
+        self.sprites = {}
+        self.full = True
+
+    def set_background(self, background):
+        self.background = background
+        self.sprites.clear()
+        self.full = True
+
+    def begin(self):
+        if self.full:
+            self.screen.blit(self.background, (0, 0))
+            self.erased = []
+        else:
+            for rect in self.dirty:
+                self.screen.blit(self.background, rect, rect)
+            self.erased = self.dirty
+            # a sprite that got erased together with a moving body has to be drawn again
+            for key, (surface, rect) in list(self.sprites.items()):
+                if rect.collidelist(self.erased) >= 0:
+                    del self.sprites[key]
+        self.dirty = []
+
+    def mark(self, rect):
+        if rect.width and rect.height:
+            self.dirty.append(rect)
+        return rect
+
+    def restore(self, rect):
+        # puts the background back without scheduling a redraw next frame
+        rect = rect.clip(self.screen.get_rect())
+        self.screen.blit(self.background, rect, rect)
+        self.erased.append(rect)
+
+    def sprite(self, key, surface, pos):
+        old = self.sprites.get(key)
+        # unchanged sprites stay, unless something was drawn over them this frame
+        if old is not None and old[0] is surface and old[1].topleft == pos and old[1].collidelist(self.dirty) < 0:
+            return
+        if old is not None:
+            self.restore(old[1])
+        rect = self.screen.blit(surface, pos)
+        self.erased.append(rect)
+        self.sprites[key] = (surface, rect)
+
+    def drop(self, key):
+        old = self.sprites.pop(key, None)
+        if old is not None:
+            self.restore(old[1])
+
+    def circle(self, color, center, radius, width=0):
+        return self.mark(pg.draw.circle(self.screen, color, center, radius, width))
+
+    def end(self):
+        rects = self.erased + self.dirty
+        if self.full or len(rects) > self.MAX_RECTS:
+            pg.display.update()
+            self.full = False
+        elif rects:
+            pg.display.update(rects)
+        return rects
+
+
+class BodyStyles:
+    # how every body looks, as typed arrays indexed like the BodySystem: a radius, a small int
+    # code into a shared color palette and bit flags. 6 bytes per body, no objects
+    RING = 1
+
+    def __init__(self, count, palette=(), default=(71, 71, 71)):
+        self.palette = []
+        self.codes = {}
+        self.names = dict(palette)
+        self._mapped = None
+        self.radius = np.zeros(count, np.float32)
+        self.color = np.full(count, self.code(default), np.uint8)
+        self.flags = np.zeros(count, np.uint8)
+
+    def code(self, color):
+        # a color name from the palette given at construction or an rgb triple
+        rgb = tuple(self.names[color]) if isinstance(color, str) else tuple(color)
+        code = self.codes.get(rgb)
+        if code is None:
+            if len(self.palette) == 256:
+                raise ValueError("more than 256 body colors")
+            code = self.codes[rgb] = len(self.palette)
+            self.palette.append(rgb)
+            self._mapped = None
+        return code
+
+    def set(self, i, radius, color, ring=False):
+        self.radius[i] = radius
+        self.color[i] = self.code(color)
+        self.flags[i] = self.RING if ring else 0
+
+    def rgb(self, i):
+        return self.palette[self.color[i]]
+
+    def pixels(self, surface):
+        # the palette as pixel values of `surface`, mapped once
+        if self._mapped is None:
+            self._mapped = pg.surfarray.map_array(surface, np.array(self.palette, np.uint8)[:, None, :])[:, 0]
+        return self._mapped
+
+
+def draw_bodies(renderer, viewport, x, y, styles, hidden=None):
+    # one vectorized cull against the viewport on both axes, bodies under a pixel are written
+    # straight into the screen pixels, only the visible big ones cost a draw call
+    radius = styles.radius
+    rings = (styles.flags & styles.RING).astype(bool)
+    pixels = styles.pixels(renderer.screen)
+    reach = radius + 5 * rings
+    visible = (x + reach >= viewport.left) & (x - reach < viewport.right) & (y + reach >= viewport.top) & (y - reach < viewport.bottom)
+    small = visible & (radius < 1)
+    if hidden is not None:
+        small &= ~hidden
+    if small.any():
+        ix = x[small].astype(np.intp)
+        iy = y[small].astype(np.intp)
+        inside = (ix >= viewport.left) & (ix < viewport.right) & (iy >= viewport.top) & (iy < viewport.bottom)
+        ix = ix[inside]
+        iy = iy[inside]
+        if len(ix):
+            screen = pg.surfarray.pixels2d(renderer.screen)
+            screen[ix, iy] = pixels[styles.color[small][inside]]
+            del screen # unlocks the screen for the draw calls below
+            left, top = ix.min(), iy.min()
+            renderer.mark(pg.Rect(left, top, ix.max() - left + 1, iy.max() - top + 1))
+    big = visible & (radius >= 1)
+    fill = big if hidden is None else big & ~hidden
+    for i in np.flatnonzero(fill):
+        renderer.circle(int(pixels[styles.color[i]]), (x[i], y[i]), float(radius[i]))
+    ringed = visible & rings if hidden is None else visible & rings & ~hidden
+    for i in np.flatnonzero(ringed):
+        renderer.circle(int(pixels[styles.color[i]]), (x[i], y[i]), float(radius[i]) + 5, 1)
+
+
+def draw_trails(renderer, samples, index, view, scale, shift, colors, skip=None):
+    # one polyline per body from its oldest sample up to where it is drawn now, samples is
+    # (bodies, count, 2) as Trails.points gives them for the bodies in `index`
+    if samples is None or samples.shape[1] == 0:
+        return
+    points = np.concatenate((samples, view[index, None]), axis=1)
+    points *= scale
+    points += shift
+    # far off screen points only need to point the right way, pygame wants them in int range
+    np.clip(points, -1e5, 1e5, out=points)
+    for b, line in enumerate(points):
+        if skip is None or not skip[b]:
+            renderer.mark(pg.draw.lines(renderer.screen, colors[b], False, line.tolist()))
+
+
+def profile_overlay(font, profiler, width=300, color=(255, 255, 255), background=(20, 20, 20)):
+    # ms per phase (mean and p99 over the buffer), the counters of the last frame and a
+    # histogram of the frame times, 0 to 50 ms
+    stats = profiler.stats()
+    lines = [f"{name:<8} {mean:6.2f} {p99:6.2f}" for name, (mean, p99) in stats.items()]
+    lines += [f"{name} {value}" for name, value in profiler.counters.items()]
+    line = font.get_linesize()
+    chart = 40
+    surface = pg.Surface((width, line * (len(lines) + 1) + chart + 10))
+    surface.fill(background)
+    surface.blit(font.render("phase    mean ms  p99", 1, color), (5, 0))
+    for i, text in enumerate(lines):
+        surface.blit(font.render(text, 1, color), (5, line * (i + 1)))
+    counts = profiler.histogram()
+    if counts.any():
+        bar = (width - 10) // len(counts)
+        bottom = surface.get_height() - 5
+        for i, count in enumerate(counts):
+            height = round(chart * count / counts.max())
+            if height:
+                surface.fill(color, (5 + i * bar, bottom - height, bar - 1, height))
+    return surface
@@ -0,0 +1,151 @@
+import itertools, json, os
+from collections import namedtuple
+
+import numpy as np
+
+from physics import AU, G, BodySystem
+
+# the color names a body can use, anything else has to be an [r, g, b] list
+COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "yellow": (255, 255, 0),
+    "blue": (0, 0, 255),
+    "red": (188, 39, 50),
+    "gray": (71, 71, 71),
+    "orange": (201, 100, 62),
+    "yellow-orange": (186, 154, 80),
+    "light-blue": (102, 201, 204),
+    "dark-light-blue": (51, 143, 145),
+}
+
+# name, distance from the sun in AU, radius in pixels, color, mass in kg, y velocity in m/s
+PLANETARY = [
+    ("sun", 0, 20, "yellow", 1.98892e30, 0),
+    ("mercury", 0.387, 4, "gray", 3.3e23, -47.4e3),
+    ("venus", 0.723, 10, "white", 4.8685e24, -35.02e3),
+    ("earth", -1, 10, "blue", 5.9742e24, 29.783e3),
+    ("mars", -1.524, 6, "red", 6.39e23, 24.077e3),
+    ("jupiter", 5.20238, 8, "orange", 1.8982e27, -13.06e3),
+    ("saturn", 9.58202, 7, "yellow-orange", 5.683e26, -9.69e3),
+    ("uranus", 19.19126, 10, "light-blue", 8.681e25, -6.8e3),
+    ("neptun", 30.13, 10, "dark-light-blue", 1.024e26, -5.43e3),
+]
+RINGS = {"saturn"}
+
+# a scene as flat arrays over all its bodies. the named bodies come first, `colors` holds
+# their color names or rgb tuples, everything after them is drawn as a single pixel
+Scenario = namedtuple("Scenario", "names pos vel mass radius colors ring sun")
+CATALOG = ("x", "y", "x_vel", "y_vel") # catalog columns, x and y in AU, velocities in m/s, "mass" is optional
+_scenarios = {}
+
+
+def planetary_reset(system):
+    return reset(system, load_scenario())
+
+
+def reset(system, scenario):
+    # a plain array copy, nothing is built per body
+    system.load(scenario.pos, scenario.vel, scenario.mass)
+    system.sun = scenario.sun
+    return list(scenario.names)
+
+
+def load_scenario(path=None, asteroids=0):
+    # the built-in solar system without a path, otherwise a json file like
+    #   {"bodies": [{"name": "sun", "mass": 1.98892e30, "radius": 20, "color": "yellow", "sun": true},
+    #               {"name": "earth", "x": -1, "y_vel": 29783, "mass": 5.9742e24, "radius": 10, "color": [0, 0, 255]}],
+    #    "belt": {"count": 1000, "inner": 2.2, "outer": 3.3}, "catalog": "asteroids.csv"}
+    # parsed once, later calls get the cached arrays until the file changes
+    key = (path and os.path.abspath(path), path and os.stat(path).st_mtime_ns, asteroids)
+    scenario = _scenarios.get(key)
+    if scenario is None:
+        scenario = _scenarios[key] = _build(path, asteroids)
+    return scenario
+
+
+def _build(path, asteroids):
+    if path is None:
+        spec = {"bodies": [{"name": name, "x": distance, "radius": radius, "color": color, "mass": mass,
+                            "y_vel": y_vel, "ring": name in RINGS, "sun": name == "sun"}
+                           for name, distance, radius, color, mass, y_vel in PLANETARY]}
+    else:
+        with open(path) as file:
+            spec = json.load(file)
+    system = BodySystem(capacity=max(16, len(spec["bodies"])))
+    names, radius, colors, ring = [], [], [], []
+    for body in spec["bodies"]:
+        i = system.add(body.get("x", 0) * AU, body.get("y", 0) * AU, body["mass"], body.get("x_vel", 0), body.get("y_vel", 0))
+        if body.get("sun"):
+            system.sun = i
+        names.append(body["name"])
+        radius.append(body.get("radius", 5))
+        colors.append(_color(body, path))
+        ring.append(body.get("ring", False))
+    if system.sun < 0:
+        system.sun = 0
+    if "belt" in spec:
+        asteroid_belt(system, **spec["belt"])
+    if "catalog" in spec:
+        system.extend(*read_catalog(os.path.join(os.path.dirname(path), spec["catalog"])))
+    if asteroids:
+        asteroid_belt(system, asteroids)
+
+    n = system.n
+    return Scenario(tuple(names), system.positions.copy(), system.velocities.copy(), system.masses.copy(),
+                    np.pad(np.array(radius, float), (0, n - len(names))), tuple(colors),
+                    np.pad(np.array(ring, bool), (0, n - len(names))), system.sun)
+
+
+def _color(body, path):
+    color = body.get("color", "white")
+    if isinstance(color, str):
+        if color not in COLORS:
+            raise ValueError(f"{path}: body {body['name']!r} has color {color!r}, "
+                             f"use one of {', '.join(COLORS)} or an [r, g, b] list")
+        return color
+    if len(color) != 3 or not all(isinstance(c, int) and 0 <= c <= 255 for c in color):
+        raise ValueError(f"{path}: body {body['name']!r} has color {color!r}, an [r, g, b] list takes three 0-255 integers")
+    return tuple(color)
+
+
+def read_catalog(path, chunk=1 << 16):
+    # a csv with a header naming at least the CATALOG columns, read `chunk` lines at a time so
+    # the text of a big catalog is never all in memory. the parsed columns are kept next to it
+    # as a .npy file that is used for as long as it is newer than the csv
+    cache = path + ".npy"
+    if os.path.exists(cache) and os.stat(cache).st_mtime_ns >= os.stat(path).st_mtime_ns:
+        data = np.load(cache)
+    else:
+        with open(path) as file:
+            header = [name.strip() for name in next(file).split(",")]
+            missing = [name for name in CATALOG if name not in header]
+            if missing:
+                raise ValueError(f"{path} has no {', '.join(missing)} column")
+            columns = [header.index(name) for name in CATALOG + (("mass",) if "mass" in header else ())]
+            blocks = []
+            while True:
+                lines = list(itertools.islice(file, chunk))
+                if not lines:
+                    break
+                blocks.append(np.loadtxt(lines, delimiter=",", usecols=columns, ndmin=2))
+        data = np.concatenate(blocks) if blocks else np.zeros((0, len(columns)))
+        if data.shape[1] == len(CATALOG):
+            data = np.c_[data, np.zeros(len(data))]
+        try:
+            np.save(cache, data)
+        except OSError:
+            pass # a read-only catalog is just parsed every time
+    return data[:, 0:2] * AU, data[:, 2:4], data[:, 4]
+
+
+def asteroid_belt(system, count, inner=2.2, outer=3.3, seed=0):
+    # massless bodies on circular orbits around the sun, they feel the planets but cost
+    # nothing in the force sum
+    rng = np.random.default_rng(seed)
+    r = AU * rng.uniform(inner, outer, count)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    speed = np.sqrt(G * system.mass[system.sun] / r)
+    pos = system.pos[system.sun] + np.c_[r * np.cos(angle), r * np.sin(angle)]
+    vel = system.vel[system.sun] + np.c_[-speed * np.sin(angle), speed * np.cos(angle)]
+    return system.extend(pos, vel, np.zeros(count))
@@ -1,249 +1,565 @@
-import pygame as pg, math, sys
+import sys
 
-class Planet_info:
-    def check(self, rect_list, pressed, planet_box):
-        n = 0
-        for i in rect_list:
-            if pg.Rect.collidepoint(i, pg.mouse.get_pos()) and pg.mouse.get_pressed()[0] and pressed == False:
-                for y in range(len(planet_box)):
-                    planet_box[y] = False
-                pressed = True
-                
-                planet_box[n] = True
-            n += 1
-        if pg.mouse.get_pressed()[0] == False:
-            pressed = False
-        return planet_box
+if __name__ == "__main__" and sys.argv[1:2] in (["simulate"], ["ensemble"], ["bench"]):
+    # batch runs never touch pygame, so they work on machines without a display
+    import headless
+    sys.exit(headless.main(sys.argv[1:]))
+
+import argparse, os, time
+from contextlib import nullcontext
+import numpy as np
+import pygame as pg
+from physics import AU, G, BodySystem
+from camera import Camera, Projector
+from checkpoint import Checkpointer, restore
+from collisions import Collisions
+from controls import Input, Picker, Widgets
+from labels import LabelCache
+from pipeline import PhysicsThread, Snapshot
+from profiler import Profiler, file_hook
+from recorder import TrajectoryReader, TrajectoryRecorder
+from render import BodyStyles, Renderer, draw_bodies, draw_trails, profile_overlay
+from scenario import COLORS, load_scenario, reset
+from trails import Trails
 
 class Planet:
-    AU = 149.6e6*1000 
-    G = 6.67428e-11 
+    AU = AU
+    G = G
     SCALE = 12 / AU 
     MINI_SCALE = 100 /AU 
     TIMESTEP = 3600*24
     
-    def __init__(self, x, y, radius, color, mass, app):
-        self.app = app 
-        self.x = x 
-        self.y = y 
-        self.radius = radius 
-        self.color = color 
-        self.mass = mass 
-        self.ring = False 
-        
-        self.sun = False 
-        self.dist_to_sun = 0 
-        
-        self.x_vel = 0 
-        self.y_vel = 0 
-        
-    def draw(self, display, planet, planet_name, size): 
-        
-        
-        x = self.x * self.SCALE + size[0] / 2
-        y = self.y * self.SCALE + size[1] / 2
-        
-        if x >= 475 or x <= 425 or y >= 475 or y <= 425:
-            if x >= 0:
-                pg.draw.circle(display, self.color, (x, y), self.radius)
-        
-        if self.ring: 
-            pg.draw.circle(display, self.color, (x, y), self.radius+5, 1)
-
-        if not self.sun: 
-            distance_text = self.app.FONT.render(f"{planet_name} - {round(self.dist_to_sun/self.AU, 3)}AU", 1, self.app.color["white"]) 
-            display.blit(distance_text, (0, 32*(planet-1))) 
+    # a handle onto body `index`, the state lives in the system's arrays and the looks in the
+    # shared style table, the handle itself is three slots
+    __slots__ = ("system", "styles", "index")
     
-    def mini_draw(self, display, size):
-        
-        x = self.x * self.MINI_SCALE + size[0] / 2 
-        y = self.y * self.MINI_SCALE + size[1] / 2
-        
-        if x > 0:
-            pg.draw.circle(display, self.color, (x, y), self.radius)
-        
-        if self.ring: 
-            pg.draw.circle(display, self.color, (x, y), self.radius+5, 1)
-
-        
-    def attraction(self, other):
-        other_x, other_y = other.x, other.y 
-        distance_x = other_x - self.x 
-        distance_y = other_y - self.y 
-        distence = math.sqrt(distance_x ** 2 + distance_y ** 2) 
-        
-        if other.sun: 
-            self.dist_to_sun = distence 
-            
-        force = self.G * self.mass * other.mass / distence**2 
-        
-        theta = math.atan2(distance_y, distance_x) 
-        force_x = math.cos(theta)* force 
-        force_y = math.sin(theta)* force 
-        return force_x, force_y 
+    def __init__(self, system, styles, index):
+        self.system = system 
+        self.styles = styles 
+        self.index = index 
     
-    def update(self, planets):
-        total_fx = total_fy = 0
-        for planet in planets: 
-            if self == planet:
-                continue
-            
-            fx, fy = self.attraction(planet) 
-            total_fx += fx
-            total_fy += fy
-            
-        self.x_vel += total_fx / self.mass * self.TIMESTEP
-        self.y_vel += total_fy / self.mass * self.TIMESTEP
-        
-        self.x += self.x_vel * self.TIMESTEP 
-        self.y += self.y_vel * self.TIMESTEP 
+    @property
+    def radius(self):
+        return float(self.styles.radius[self.index])
+    
+    @property
+    def color(self):
+        return self.styles.rgb(self.index)
+    
+    @property
+    def ring(self):
+        return bool(self.styles.flags[self.index] & BodyStyles.RING)
+    
+    @property
+    def x(self):
+        return self.system.pos[self.index, 0]
+    
+    @x.setter
+    def x(self, value):
+        self.system.pos[self.index, 0] = value
+        self.system.touch()
+    
+    @property
+    def y(self):
+        return self.system.pos[self.index, 1]
+    
+    @y.setter
+    def y(self, value):
+        self.system.pos[self.index, 1] = value
+        self.system.touch()
+    
+    @property
+    def x_vel(self):
+        return self.system.vel[self.index, 0]
+    
+    @x_vel.setter
+    def x_vel(self, value):
+        self.system.vel[self.index, 0] = value
+        self.system.touch()
+    
+    @property
+    def y_vel(self):
+        return self.system.vel[self.index, 1]
+    
+    @y_vel.setter
+    def y_vel(self, value):
+        self.system.vel[self.index, 1] = value
+        self.system.touch()
+    
+    @property
+    def mass(self):
+        return self.system.mass[self.index]
+    
+    @mass.setter
+    def mass(self, value):
+        self.system.mass[self.index] = value
+        self.system.touch()
+    
+    @property
+    def sun(self):
+        return self.system.sun == self.index
+    
+    @sun.setter
+    def sun(self, value):
+        if value:
+            self.system.sun = self.index
+        elif self.sun:
+            self.system.sun = -1
+    
+    @property
+    def dist_to_sun(self):
+        return self.system.dist_to_sun(self.index)
         
         
         
 class App:
-    def __init__(self):
+    DAY = 3600*24
+    YEAR = 365.25*DAY
+    WARP_MIN = DAY # simulated seconds per real second
+    WARP_MAX = 100*YEAR
+    MAX_FRAME = 0.25 # longest frame we try to catch up on, in seconds
+    STEP_BUDGET = 1/120 # wall time the physics may take per frame
+    PHASES = ("physics", "draw", "labels", "events", "display", "idle")
+    PROFILE_EVERY = 15 # frames between redraws of the profile overlay
+    
+    def __init__(self, replay=None, asteroids=0, profile=None, scenario=None, collisions=None, softening=0.0, trail_length=512, trail_every=4,
+                 checkpoint="solar_system.ckpt", checkpoint_every=0.0, resume=None, threaded=True):
         pg.init() 
         
-        self.color = {
-            "white" : (255, 255, 255),
-            "black" : (0, 0, 0),
-            "yellow": (255,255,0),
-            "blue": (0,0,255),
-            "red": (188,39,50),
-            "gray": (71, 71, 71),
-            "orange": (201, 100, 62),
-            "yellow-orange": (186, 154, 80),
-            "light-blue": (102, 201, 204),
-            "dark-light-blue": (51, 143, 145)
-        }
+        self.color = COLORS
         
         self.FONT = pg.font.SysFont("comicsans", 16)
-        
-        self.planets = []
-        self.planet_names = []
-        self.planetary_reset()
+        self.labels = LabelCache(self.FONT)
+        self.MONO = pg.font.SysFont("monospace", 14)
+        
+        # timers always run, the overlay is toggled from "view", `profile` is a .csv or .jsonl file
+        self.profiler = Profiler(self.PHASES)
+        self.show_profile = False
+        if profile is not None:
+            self.profiler.hooks.append(file_hook(profile))
+        
+        self.system = BodySystem(softening=softening)
+        if collisions is not None:
+            self.system.collisions = Collisions(collisions)
+        self.recorder = None
+        self.replay = None
+        self.scenario = load_scenario(scenario, asteroids)
+        self.build_bodies()
+        # "edit" or F5 saves a checkpoint in the background, F9 goes back to it, with
+        # `checkpoint_every` wall seconds it is also saved on its own
+        self.checkpointer = Checkpointer()
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.last_checkpoint = time.perf_counter()
+        if resume is not None:
+            restore(self.system, resume, self.system.n)
+            np.copyto(self.previous, self.system.positions)
+        # the planets leave trails, every body would be bodies x length x 16 bytes
+        trailed = [planet for planet in self.planets if not planet.sun]
+        self.trails = Trails([planet.index for planet in trailed], max(trail_length, 1), trail_every)
+        self.trail_colors = [tuple(c // 2 for c in planet.color) for planet in trailed]
+        self.show_trails = trail_length > 0
+        if replay is not None:
+            self.replay = TrajectoryReader(replay)
+            if self.replay.bodies != self.system.n:
+                raise ValueError(f"{replay} holds {self.replay.bodies} bodies, the scene has {self.system.n}")
+            self.replay_time = self.replay.t0
+        # the physics steps on its own thread and hands over finished states, a frame draws
+        # the latest one whatever the thread is doing. replays and benchmarks step in the frame
+        self.physics = None
+        if threaded and replay is None:
+            self.physics = PhysicsThread(self.system, Planet.TIMESTEP, self.trails, self.after_step)
+        self.shown = None
+        self.steps_shown = 0
         
         self.res = self.width, self.height = 1600, 900
         self.tool = self.tool_width, self.tool_height = self.width, 30
         self.clock = pg.time.Clock()
+        self.fps = 60 # 0 runs uncapped
         self.screen = pg.display.set_mode(self.res)
-        self.main_display = pg.Surface((self.width, self.height-self.tool_height))
-        self.display = pg.Surface((417,417))
-        self.tool_bar = pg.Surface(self.tool)
+        self.main_center = (450, 450+self.tool_height)
+        self.mini_rect = pg.Rect(1100, 40+self.tool_height, 417, 417)
+        self.main_rect = pg.Rect(0, self.tool_height, self.width, self.height-self.tool_height)
+        
+        # every viewport has its own camera, both follow the sun at first. moving the view
+        # never moves the sun itself, that would break the integrator
+        self.views = [
+            ("main", self.main_rect, Camera(self.main_center, Planet.SCALE, self.system.sun)),
+            ("mini", self.mini_rect, Camera(self.mini_rect.center, Planet.MINI_SCALE, self.system.sun)),
+        ]
+        self.projector = Projector()
+        self.boxed = True
+        self.paused = False
+        self.warp = 60*self.DAY
+        self.accumulator = 0.0
+        self.frame_time = 0.0
+        self.substeps = 0
         
-        self.sun_lock = True
         
-        
-        self.rect_list = []
-        self.planet_boxes = []
         self.option_rects = []
         self.tool_list = ["file", "edit", "view", "reset"]
-        self.tool_func = []
         self.option_box_size = 50
-        
-        for i in range(len(self.tool_list)):
-            self.tool_func.append(False)
-        for i in range(0, len(self.planets)-1):
-            self.rect_list.append(pg.Rect(0,32*i+20, 200, 32))
-        for i in range(0, len(self.planets)-1):
-            self.planet_boxes.append(False)
         for i in range(len(self.tool_list)):
             self.option_rects.append(pg.Rect(i*self.option_box_size, 0, self.option_box_size, self.tool_height))
         
-        
-        self.mouse_pressed = False
-        
-        self.planet_box = Planet_info()
+        # clicks are dispatched from the event queue, the toolbar and the distance labels are
+        # widgets, a click anywhere else picks the nearest body in the view under the mouse
+        self.selected = None
+        self.widgets = Widgets()
+        for rect, action in zip(self.option_rects, (self.toggle_recording, self.save_checkpoint, self.toggle_profile, self.reset_clicked)):
+            self.widgets.add(rect, action)
+        # one row per body but the sun, wherever the scenario lists it
+        self.label_rows = {planet.index: row for row, planet in enumerate(p for p in self.planets if not p.sun)}
+        for i, row in self.label_rows.items():
+            self.widgets.add((0, self.tool_height + 32*row, 200, 32), lambda event, i=i: self.select(i))
+        self.pickers = {"main": Picker(), "mini": Picker()}
+        self.input = Input(self.widgets, self.pick)
+        
+        self.renderer = Renderer(self.screen, self.build_background())
         
         pg.display.set_caption("solar sim")
     
+    def build_bodies(self):
+        # once per scenario, a reset only copies the arrays back
+        scenario = self.scenario
+        self.planet_names = reset(self.system, scenario)
+        # what the renderer needs per body, asteroids are single gray pixels
+        self.styles = BodyStyles(self.system.n, self.color, self.color["gray"])
+        for i, color in enumerate(scenario.colors):
+            self.styles.set(i, scenario.radius[i], color, scenario.ring[i])
+        self.planets = [Planet(self.system, self.styles, i) for i in range(len(scenario.names))]
+        self.previous = self.system.positions.copy()
+        self.accumulator = 0.0
+    
     def planetary_reset(self):
-        star = Planet(0, 0, 20, self.color["yellow"], 1.98892e30, self)
-        star.sun = True
-        
-        earth = Planet(-1*Planet.AU, 0, 10, self.color["blue"], 5.9742e24, self)
-        earth.y_vel = 29.783e3
-        
-        mars = Planet(-1.524* Planet.AU, 0, 6, self.color["red"], 6.39e23, self)
-        mars.y_vel = 24.077e3
-        
-        mercury = Planet(0.387* Planet.AU, 0, 4, self.color["gray"], 3.3e23, self)
-        mercury.y_vel = -47.4e3
-        
-        venus = Planet(0.723 * Planet.AU, 0, 10, self.color["white"], 4.8685e24, self)
-        venus.y_vel = -35.02e3
-        
-        jupiter = Planet(5.20238*Planet.AU, 0, 8, self.color["orange"], 1.8982e27, self)
-        jupiter.y_vel = -13.06e3
-        
-        saturn = Planet(9.58202*Planet.AU, 0, 7, self.color["yellow-orange"], 5.683e26, self)
-        saturn.y_vel = -9.69e3
-        saturn.ring = True
-        
-        uranus = Planet(19.19126*Planet.AU, 0, 10, self.color["light-blue"], 8.681e25, self)
-        uranus.y_vel = -6.8e3
-        
-        neptune = Planet(30.13*Planet.AU, 0, 10, self.color["dark-light-blue"], 1.024e26, self)
-        neptune.y_vel = -5.43e3
-        
-        self.planets = [star, mercury, venus, earth, mars, jupiter, saturn, uranus, neptune]
-        self.planet_names = ["sun", "mercury", "venus","earth", "mars", "jupiter", "saturn", "uranus", "neptun"]
+        self.stop_recording()
+        with self.editing():
+            reset(self.system, self.scenario)
+            np.copyto(self.previous, self.system.positions)
+            self.accumulator = 0.0
+            self.trails.clear()
+    
+    def editing(self):
+        # anything that changes the system from the window goes through here, the physics
+        # thread waits meanwhile
+        return self.physics.editing() if self.physics is not None else nullcontext(self.system)
+    
+    def after_step(self, system):
+        self.trails.record(system.positions)
+        if self.recorder is not None:
+            self.recorder.record(system)
+    
+    def build_background(self):
+        # everything that does not move, drawn once
+        background = pg.Surface(self.res)
+        background.fill(self.color["black"])
+        background.fill(self.color["white"], (0, 0, self.tool_width, self.tool_height))
+        for i in range(len(self.tool_list)):
+            info_box = self.labels.text(self.tool_list[i], self.color["black"])
+            background.blit(info_box, (i*self.option_box_size+5, 5))
+        top = self.tool_height
+        if self.boxed:
+            pg.draw.rect(background, self.color["gray"], (422,422+top,52,52))
+            pg.draw.rect(background, self.color["black"], (423,423+top,50,50))
+        pg.draw.rect(background, self.color["gray"], (1099,39+top,419,419))
+        pg.draw.rect(background, self.color["black"], self.mini_rect)
+        return background
+    
+    def set_warp(self, warp):
+        self.warp = min(max(warp, self.WARP_MIN), self.WARP_MAX)
+    
+    def start_recording(self):
+        path = time.strftime("recording_%Y%m%d_%H%M%S.traj")
+        with self.editing():
+            self.recorder = TrajectoryRecorder(path, self.system, Planet.TIMESTEP, self.planet_names)
+    
+    def stop_recording(self):
+        if self.recorder is not None:
+            with self.editing():
+                self.recorder.close()
+                self.recorder = None
+    
+    def toggle_recording(self, event):
+        if self.replay is None:
+            if self.recorder is None:
+                self.start_recording()
+            else:
+                self.stop_recording()
+    
+    def save_checkpoint(self, event=None):
+        if self.replay is None:
+            with self.editing():
+                self.checkpointer.save(self.checkpoint, self.system, self.planet_names)
+            self.last_checkpoint = time.perf_counter()
+    
+    def restore_checkpoint(self):
+        if self.replay is not None or not os.path.exists(self.checkpoint):
+            return
+        self.checkpointer.wait()
+        self.stop_recording()
+        with self.editing():
+            try:
+                restore(self.system, self.checkpoint, self.system.n)
+            except ValueError as error:
+                print(error, file=sys.stderr)
+                return
+            np.copyto(self.previous, self.system.positions)
+            self.accumulator = 0.0
+            self.trails.clear()
+    
+    def toggle_profile(self, event):
+        self.show_profile = not self.show_profile
+        if not self.show_profile:
+            self.renderer.drop("profile")
+    
+    def reset_clicked(self, event):
+        if self.replay is None:
+            self.planetary_reset()
+    
+    def select(self, index):
+        shown = self.shown
+        if index is not None and shown is not None and shown.alive is not None and not shown.alive[index]:
+            # merged away, its label is gone but a click may still land where it was
+            return
+        self.selected = None if index == self.selected else index
+        if self.selected is None:
+            self.renderer.drop("selected")
+    
+    def view_at(self, pos):
+        # the topmost viewport under pos
+        for view in reversed(self.views):
+            if view[1].collidepoint(pos):
+                return view
+        return None
+    
+    def pick(self, event):
+        view = self.view_at(event.pos)
+        if view is None:
+            return
+        index = self.pickers[view[0]].pick(event.pos)
+        if index is not None or self.selected is not None:
+            self.select(index if index is not None else self.selected)
+    
+    def seek(self, t):
+        self.replay_time = min(max(t, self.replay.t0), self.replay.t1)
+    
+    def advance(self, frame_time):
+        # the state to draw this frame
+        if self.physics is not None:
+            self.physics.warp = 0.0 if self.paused else self.warp
+            shown = self.physics.latest()
+            self.substeps = shown.steps - self.steps_shown
+            self.steps_shown = shown.steps
+            # placed between its last two steps by how much time has passed since
+            return shown.at(time.perf_counter(), Planet.TIMESTEP)
+        system = self.system
+        collisions = system.collisions
+        alive = None
+        if collisions is not None and len(collisions.alive) == system.n:
+            alive = collisions.alive
+        if self.replay is not None:
+            # replay reads the states back from disk, nothing is simulated
+            if self.paused:
+                frame_time = 0.0
+            self.seek(self.replay_time + min(frame_time, self.MAX_FRAME) * self.warp)
+            view = self.replay.positions_at(self.replay_time)
+            np.copyto(system.positions, view)
+            system.time = self.replay_time
+            self.trails.record(view)
+            return Snapshot(system.time, 0, system.sun, view, system.velocities, alive, self.trails.points())
+        # the physics takes fixed steps, as many as the warp asks for, and the view is
+        # interpolated between the last two states so it stays smooth at any warp
+        if self.paused:
+            frame_time = 0.0
+        self.accumulator += min(frame_time, self.MAX_FRAME) * self.warp
+        start = time.perf_counter()
+        self.substeps = 0
+        while self.accumulator >= Planet.TIMESTEP:
+            np.copyto(self.previous, system.positions)
+            system.step(Planet.TIMESTEP)
+            self.after_step(system)
+            self.accumulator -= Planet.TIMESTEP
+            self.substeps += 1
+            if time.perf_counter() - start > self.STEP_BUDGET:
+                # the renderer fell behind, skip the time we could not simulate instead of piling it up
+                self.accumulator %= Planet.TIMESTEP
+                break
+        alpha = self.accumulator / Planet.TIMESTEP
+        view = self.previous + (system.positions - self.previous) * alpha
+        return Snapshot(system.time, 0, system.sun, view, system.velocities, alive, self.trails.points(), alpha)
+    
+    def warp_parts(self):
+        # (text, static) parts for labels.compose, the numbers are put together from cached
+        # glyphs so a replay counting days does not render the whole line every frame
+        if self.warp >= self.YEAR:
+            parts = [("time warp ", True), (f"{self.warp/self.YEAR:.3g}", False), (" years/s", True)]
+        else:
+            parts = [("time warp ", True), (f"{self.warp/self.DAY:.3g}", False), (" days/s", True)]
+        if self.paused:
+            parts.append(("  paused", True))
+        if self.replay is not None:
+            parts += [("  replay day ", True), (f"{(self.replay_time - self.replay.t0)/self.DAY:.0f}", False),
+                      (" of ", True), (f"{(self.replay.t1 - self.replay.t0)/self.DAY:.0f}", False)]
+        elif self.recorder is not None:
+            parts.append((f"  recording {self.recorder.path}", True))
+        written = self.checkpointer.written
+        if written is not None and time.time() - written[2] < 3:
+            parts += [(f"  saved {written[0]} at day ", True), (f"{written[1]/self.DAY:.0f}", False)]
+        return tuple(parts)
+    
+    def frame(self):
+        profiler = self.profiler
+        profiler.begin()
+        self.renderer.begin()
+        shown = self.shown = self.advance(self.frame_time)
+        view = shown.pos
+        if self.checkpoint_every and time.perf_counter() - self.last_checkpoint > self.checkpoint_every:
+            self.save_checkpoint()
+        profiler.lap("physics")
+        
+        # one transform for all viewports, reused as long as nothing moved
+        version = (shown.time, shown.steps, shown.alpha, getattr(self, "replay_time", None))
+        xs, ys = self.projector(view, [camera for _, _, camera in self.views], version)
+        
+        # bodies that merged into another one keep their index but are not drawn
+        gone = None if shown.alive is None else ~shown.alive
+        main = self.views[0][2]
+        if main.at_home != self.boxed:
+            self.boxed = main.at_home
+            self.renderer.set_background(self.build_background())
+        for k, (name, rect, camera) in enumerate(self.views):
+            x, y = xs[k], ys[k]
+            hidden = gone
+            if k == 0 and self.boxed:
+                # at the home zoom the inner planets do not fit the small box in the middle, the mini map shows them
+                hidden = (abs(x - self.main_center[0]) < 25) & (abs(y - self.main_center[1]) < 25)
+                if gone is not None:
+                    hidden |= gone
+            if k > 0:
+                # later viewports sit on top of the earlier ones
+                for dirty in self.renderer.dirty:
+                    if dirty.colliderect(rect):
+                        self.renderer.restore(dirty.clip(rect))
+                self.screen.set_clip(rect)
+            if self.show_trails:
+                skip = None if hidden is None else hidden[self.trails.index]
+                draw_trails(self.renderer, shown.trails, self.trails.index, view, camera.scale, camera.shift(view), self.trail_colors, skip)
+            draw_bodies(self.renderer, rect, x, y, self.styles, hidden)
+            self.pickers[name].update(x, y, self.styles.radius, hidden)
+            if self.selected is not None and (hidden is None or not hidden[self.selected]):
+                self.renderer.circle(self.color["white"], (x[self.selected], y[self.selected]), float(self.styles.radius[self.selected]) + 4, 1)
+        self.screen.set_clip(None)
+        profiler.lap("draw")
+        
+        if self.selected is not None and gone is not None and gone[self.selected]:
+            self.selected = None
+            self.renderer.drop("selected")
+        for i, row in self.label_rows.items():
+            if (gone is not None and gone[i]) or i == shown.sun:
+                self.renderer.drop(("distance", i))
+            else:
+                distance = np.hypot(*(view[i] - view[shown.sun]))
+                distance_text = self.labels.value(f"{self.planet_names[i]} - ", round(distance/AU, 3), "AU", self.color["white"])
+                self.renderer.sprite(("distance", i), distance_text, (0, self.tool_height + 32*row))
+        
+        if self.selected is not None:
+            i = self.selected
+            name = self.planet_names[i] if i < len(self.planet_names) else f"body {i}"
+            speed = np.hypot(*(shown.vel[i] - shown.vel[shown.sun]))
+            distance = np.hypot(*(view[i] - view[shown.sun]))
+            parts = ((f"{name} - ", True), (f"{distance/AU:.3f}", False), ("AU ", True), (f"{speed/1000:.2f}", False), ("km/s", True))
+            selected_text = self.labels.compose(parts, self.color["white"])
+            self.renderer.sprite("selected", selected_text, (0, self.height-60))
+        
+        warp_text = self.labels.compose(self.warp_parts(), self.color["white"])
+        self.renderer.sprite("warp", warp_text, (0, self.height-30))
+        if self.show_profile and profiler.frames % self.PROFILE_EVERY == 0:
+            self.renderer.sprite("profile", profile_overlay(self.MONO, profiler), (self.mini_rect.left, self.mini_rect.bottom + 15))
+        profiler.lap("labels")
+        
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                if self.physics is not None:
+                    self.physics.stop()
+                self.stop_recording()
+                self.checkpointer.close()
+                for hook in profiler.hooks:
+                    if hasattr(hook, "close"):
+                        hook.close()
+                pg.quit()
+                sys.exit()
+            if event.type == pg.KEYDOWN:
+                if event.key in (pg.K_UP, pg.K_PLUS, pg.K_EQUALS, pg.K_KP_PLUS):
+                    self.set_warp(self.warp*2)
+                elif event.key in (pg.K_DOWN, pg.K_MINUS, pg.K_KP_MINUS):
+                    self.set_warp(self.warp/2)
+                elif self.replay is not None and event.key in (pg.K_LEFT, pg.K_RIGHT):
+                    jump = (self.replay.t1 - self.replay.t0) / 20
+                    self.seek(self.replay_time + (jump if event.key == pg.K_RIGHT else -jump))
+                    self.trails.clear()
+                elif self.replay is not None and event.key in (pg.K_HOME, pg.K_END):
+                    self.seek(self.replay.t0 if event.key == pg.K_HOME else self.replay.t1)
+                    self.trails.clear()
+                elif event.key == pg.K_F5:
+                    self.save_checkpoint()
+                elif event.key == pg.K_F9:
+                    self.restore_checkpoint()
+                elif event.key == pg.K_t:
+                    self.show_trails = not self.show_trails
+                elif event.key == pg.K_SPACE:
+                    self.paused = not self.paused
+                elif event.key == pg.K_f:
+                    # the main view follows the selected body, or the sun again
+                    self.views[0][2].set_follow(self.selected if self.selected is not None else shown.sun)
+                elif event.key == pg.K_c:
+                    for _, _, camera in self.views:
+                        camera.reset()
+            elif event.type == pg.MOUSEWHEEL:
+                pos = pg.mouse.get_pos()
+                view = self.view_at(pos)
+                if view is not None:
+                    view[2].zoom(1.25 ** event.y, pos)
+            elif event.type == pg.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+                # dragging with the right or middle button pans the view under the mouse
+                view = self.view_at(event.pos)
+                if view is not None:
+                    view[2].pan(*event.rel)
+            self.input.handle(event)
+        profiler.lap("events")
+        
+        self.renderer.end()
+        profiler.lap("display")
+        self.frame_time = self.clock.tick(self.fps)/1000
+        profiler.lap("idle")
+        profiler.end(bodies=self.system.n, substeps=self.substeps)
     
     def run(self):
         while True:
-            self.main_display.fill(self.color["black"])
-            self.display.fill(self.color["black"])
-            self.tool_bar.fill(self.color["white"])
-            n = 0
-            if self.sun_lock:
-                self.planets[0].x = 0
-                self.planets[0].y = 0
-            
-            for planet in self.planets:
-                planet.update(self.planets)
-                planet.draw(self.main_display, n, self.planet_names[n], (900,900))
-                planet.mini_draw(self.display, (417,417))
-                n += 1
-            
-            pg.draw.rect(self.main_display, self.color["gray"], (422,422,52,52))
-            pg.draw.rect(self.main_display, self.color["black"], (423,423,50,50))
-            pg.draw.rect(self.main_display, self.color["gray"], (1099,39,419,419))
-            
-            for i in range(len(self.tool_list)):
-                info_box = self.FONT.render(f"{self.tool_list[i]}", 1, self.color["black"])
-                self.tool_bar.blit(info_box, (i*self.option_box_size+5, 5))
-                
-            for i in range(0, len(self.tool_list)):
-                if pg.Rect.collidepoint(self.option_rects[i],pg.mouse.get_pos()) and pg.mouse.get_pressed()[0]:
-                    self.tool_func[i] = True
-                else:
-                    self.tool_func[i] = False
-            
-            if self.tool_func[0]:
-                pass
-            elif self.tool_func[1]:
-                pass
-            elif self.tool_func[2]:
-                pass
-            elif self.tool_func[3]:
-                self.planetary_reset()
-            
-            
-            
-            self.main_display.blit(self.display,(1100,40))
-            self.screen.blit(self.tool_bar,(0,0))
-            self.screen.blit(self.main_display,(0,self.tool_height))
-            
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    pg.quit()
-                    sys.exit()
-                
-                self.planet_boxes = self.planet_box.check(self.rect_list, self.mouse_pressed, self.planet_boxes)
-                
-            self.clock.tick(60)
-            pg.display.update()
+            self.frame()
 
 if __name__ == "__main__":
-    app = App()
+    parser = argparse.ArgumentParser(prog="solar_system")
+    parser.add_argument("command", nargs="?", choices=["replay"])
+    parser.add_argument("path", nargs="?", help="recording to replay")
+    parser.add_argument("--asteroids", type=int, default=0, help="massless bodies in the main belt")
+    parser.add_argument("--scenario", help="json scenario to load instead of the solar system")
+    parser.add_argument("--collisions", choices=("merge", "bounce"), help="let bodies that touch merge or bounce")
+    parser.add_argument("--softening", type=float, default=0.0, help="plummer softening length in m")
+    parser.add_argument("--trail-length", type=int, default=512, help="samples kept per planet trail, 0 turns trails off")
+    parser.add_argument("--trail-every", type=int, default=4, help="physics steps between trail samples")
+    parser.add_argument("--profile", help="write per frame phase timings to this .csv or .jsonl file")
+    parser.add_argument("--checkpoint", default="solar_system.ckpt", help="where \"edit\" and F5 save the state and F9 restores it from")
+    parser.add_argument("--checkpoint-every", type=float, default=0.0, help="also save a checkpoint every this many seconds")
+    parser.add_argument("--resume", help="start from this checkpoint")
+    parser.add_argument("--single-thread", dest="threaded", action="store_false", help="step the physics inside the frame instead of on its own thread")
+    args = parser.parse_args()
+    if args.command == "replay":
+        app = App(replay=args.path, asteroids=args.asteroids, profile=args.profile, scenario=args.scenario,
+                  trail_length=args.trail_length, trail_every=args.trail_every)
+    else:
+        app = App(asteroids=args.asteroids, profile=args.profile, scenario=args.scenario,
+                  collisions=args.collisions, softening=args.softening,
+                  trail_length=args.trail_length, trail_every=args.trail_every,
+                  checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every, resume=args.resume,
+                  threaded=args.threaded)
     app.run()
\ No newline at end of file
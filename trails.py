@@ -0,0 +1,32 @@
+import numpy as np
+
+
+class Trails:
+    # the last `length` positions of some bodies, one sample every `every` steps, in a single
+    # preallocated (bodies, length, 2) ring buffer. memory and drawing cost stay the same
+    # however long the simulation runs
+    def __init__(self, index, length=512, every=4):
+        self.index = np.asarray(index, np.intp)
+        self.length = length
+        self.every = every
+        self.buffer = np.zeros((len(self.index), length, 2))
+        self.clear()
+
+    def clear(self):
+        self.head = 0 # where the next sample goes
+        self.count = 0
+        self.steps = 0
+
+    def record(self, pos):
+        self.steps += 1
+        if self.steps % self.every:
+            return
+        self.buffer[:, self.head] = pos[self.index]
+        self.head = (self.head + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def points(self):
+        # oldest to newest, (bodies, count, 2)
+        if self.count < self.length:
+            return self.buffer[:, :self.count]
+        return np.concatenate((self.buffer[:, self.head:], self.buffer[:, :self.head]), axis=1)